@@ -0,0 +1,82 @@
+import threading
+from items.catalog import get_manager
+from items.popularity import Popularity
+from items.position import Position
+from storage.user_store import get_store
+
+
+class AppContext:
+    """Ресурсы сервера, создаваемые при первом обращении.
+
+    Импорт модулей и создание контекста ничего не читают с диска: пользователи,
+    каталог и популярность загружаются, когда их впервые запросит обработчик.
+    """
+
+    def __init__(self, users_paths, positions_path):
+        self.users_paths = list(users_paths)
+        self.positions_path = positions_path
+        self.replica = None
+        self.__lock = threading.RLock()
+        self.__user_store = None
+        self.__catalog_manager = None
+        self.__popularity = None
+
+    @property
+    def user_store(self):
+        """Хранилище пользователей; сервер единолично владеет файлами и держит их в памяти"""
+        if self.__user_store is None:
+            with self.__lock:
+                if self.__user_store is None:
+                    store = get_store(self.users_paths, reload_on_change=False)
+                    store.load()
+                    self.__user_store = store
+        return self.__user_store
+
+    @property
+    def catalog_manager(self):
+        if self.__catalog_manager is None:
+            with self.__lock:
+                if self.__catalog_manager is None:
+                    self.__catalog_manager = get_manager(self.positions_path, Position.read_file)
+        return self.__catalog_manager
+
+    @property
+    def popularity(self):
+        """Популярность по историям просмотров, обновляемая по изменениям хранилища пользователей.
+
+        На реплике хранилище наполняется снимком из журнала уже после создания
+        популярности: записи снимка приходят через ту же подписку.
+        """
+        if self.__popularity is None:
+            with self.__lock:
+                if self.__popularity is None:
+                    popularity = Popularity(self.catalog_manager.current)
+                    store = self.user_store
+                    store.subscribe(popularity.observe)
+                    popularity.seed(store.all())
+                    popularity.refresh()
+                    self.__popularity = popularity
+        return self.__popularity
+
+    def use_replica(self, replica):
+        """Переключает чтение пользователей на хранилище реплики"""
+        with self.__lock:
+            self.replica = replica
+            self.__user_store = replica.store
+
+    def loaded(self):
+        """Имена уже созданных ресурсов"""
+        resources = {'user_store': self.__user_store, 'catalog_manager': self.__catalog_manager,
+                     'popularity': self.__popularity}
+        return sorted(name for name, resource in resources.items() if resource is not None)
+
+    def warm_up(self):
+        """Загружает все ресурсы заранее, чтобы первый запрос не платил за чтение файлов"""
+        self.catalog_manager.current()
+        return self.popularity
+
+    def start(self):
+        """Запускает фоновые потоки: слежение за каталогом и пересчёт популярности"""
+        self.warm_up()
+        self.catalog_manager.start()
+        self.popularity.start()
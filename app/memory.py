@@ -0,0 +1,193 @@
+import math
+import sys
+import threading
+import tracemalloc
+import types
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Объекты, которые не принадлежат структуре данных и не обходятся при подсчёте
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                  types.MethodType, types.CodeType, types.FrameType)
+
+
+def deep_sizeof(obj, seen=None):
+    """Размер объекта вместе со всем, на что он ссылается, в байтах.
+
+    seen — множество id уже посчитанных объектов: общий seen для нескольких
+    вызовов не даёт посчитать разделяемые объекты дважды.
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIPPED_TYPES):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, int, float, bool)) or item is None:
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        if hasattr(item, '__dict__'):
+            stack.append(vars(item))
+        for slot in getattr(type(item), '__slots__', ()):
+            if hasattr(item, slot):
+                stack.append(getattr(item, slot))
+    return total
+
+
+def catalog_sections(catalog):
+    """Составные части снимка каталога для отчёта о памяти"""
+    return {
+        'positions': catalog.positions,
+        'records': catalog.records,
+        'by_id': catalog.by_id,
+        'fragments': catalog.fragments,
+        'postings': catalog.postings,
+        'index': catalog.index,
+    }
+
+
+class MemoryMonitor:
+    """Учёт памяти по структурам данных и соблюдение бюджета.
+
+    sections — словарь: раздел -> функция, возвращающая {часть: объект}.
+    Профили пользователей считаются по шардам хранилища; при превышении
+    budget байт профили, не использованные за последний interval, вытесняются
+    в файлы своих шардов (UserShard.evict), начиная с самого большого шарда.
+    Каталог и кэши не вытесняются: у них свои ограничения размера.
+    """
+
+    def __init__(self, sections, store_provider, budget=None, interval=10.0, trace_frames=0):
+        self.sections = sections
+        self.store_provider = store_provider
+        self.budget = budget
+        self.interval = interval
+        self.trace_frames = trace_frames
+        self.evicted = 0
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def __user_shards(self):
+        store = self.store_provider()
+        shards = getattr(store, 'shards', None)
+        return shards() if shards is not None else []
+
+    def measure(self):
+        """Размеры разделов и шардов пользователей; объекты, общие для частей, считаются один раз"""
+        seen = set()
+        sections = {}
+        for name, provider in self.sections.items():
+            parts = {part: deep_sizeof(obj, seen) for part, obj in provider().items()}
+            sections[name] = {'parts': parts, 'total': sum(parts.values())}
+        shards = {}
+        for shard in self.__user_shards():
+            with shard.lock:
+                shards[shard.path] = deep_sizeof(shard.cached_records(), seen) if shard.loaded else None
+        sections['users'] = {'parts': shards, 'total': sum(size or 0 for size in shards.values())}
+        total = sum(section['total'] for section in sections.values())
+        return {'sections': sections, 'total': total}
+
+    def enforce(self):
+        """Вытесняет давно не использованные профили, пока учтённая память превышает бюджет.
+
+        Сколько профилей вытеснить, оценивается по среднему размеру профиля в шарде;
+        если оценки не хватило, замер и вытеснение повторяются. Возвращает число
+        вытесненных профилей.
+        """
+        with self.__lock:
+            evicted = 0
+            while self.budget is not None:
+                measured = self.measure()
+                excess = measured['total'] - self.budget
+                if excess <= 0:
+                    break
+                removed = self.__evict(excess, measured['sections']['users']['parts'])
+                if not removed:
+                    break
+                evicted += removed
+            self.evicted += evicted
+            for shard in self.__user_shards():
+                shard.age()
+            return evicted
+
+    def __evict(self, excess, sizes):
+        evicted = 0
+        for shard in sorted(self.__user_shards(), key=lambda shard: sizes.get(shard.path) or 0, reverse=True):
+            if excess <= 0:
+                break
+            with shard.lock:
+                records = shard.cached_records()
+                count = len(records) if records else 0
+            if not count or not sizes.get(shard.path):
+                continue
+            record_size = sizes[shard.path] / count
+            removed = shard.evict(math.ceil(excess / record_size))
+            excess -= removed * record_size
+            evicted += removed
+        return evicted
+
+    def report(self, top=10):
+        """Отчёт для отладочного эндпоинта: разделы, бюджет, tracemalloc и пик RSS процесса"""
+        measured = self.measure()
+        report = {
+            'sections': measured['sections'],
+            'total': measured['total'],
+            'budget': self.budget,
+            'over_budget': self.budget is not None and measured['total'] > self.budget,
+            'evicted_profiles': self.evicted,
+            'profiles_on_disk': sum(shard.evicted_count for shard in self.__user_shards()),
+            'tracemalloc': None,
+            'max_rss': _max_rss(),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics('filename')
+            report['tracemalloc'] = {
+                'current': current,
+                'peak': peak,
+                'top': [{'file': stat.traceback[0].filename, 'size': stat.size, 'count': stat.count}
+                        for stat in statistics[:top]],
+            }
+        return report
+
+    def start(self):
+        if self.trace_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        if self.__thread is not None or self.budget is None:
+            return
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name='memory-monitor', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__stop.set()
+            self.__thread.join()
+            self.__thread = None
+
+    def __run(self):
+        while not self.__stop.wait(self.interval):
+            try:
+                self.enforce()
+            except Exception as e:
+                # Например, не удалось записать шард: пробуем снова на следующем проходе
+                print(f"Не удалось применить бюджет памяти: {e}")
+
+
+def _max_rss():
+    """Пиковый RSS процесса в байтах (None, где модуля resource нет)"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
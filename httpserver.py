@@ -1,57 +1,411 @@
-import json
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
+from collections import OrderedDict
+from itertools import islice
+import argparse
 import re
-import os
+import threading
+import time
+from types import GeneratorType
+from app.context import AppContext
+from items import rerank
+from server.admission import BoundedHTTPServer, RouteLimiter
+from storage import codec
+from storage.singleflight import SingleFlight
 from user.user import User
+from user.viewed import as_viewed_set
 
 USERS_FILE = "users.json"
+USER_SHARD_FILES = [USERS_FILE]  # Шарды пользователей; по умолчанию один файл
 POSITIONS_FILE = "positions.json"
 
+# Пользователи, каталог и популярность загружаются при первом запросе, а не при импорте
+app = AppContext(USER_SHARD_FILES, POSITIONS_FILE)
 
-def load_file(filename):
-    if not os.path.exists(filename):
-        return []
-    with open(filename, 'r', encoding='utf-8') as f:
-        return json.load(f)
+# Режим реплики (app.replica): пользователи приходят из журнала первичного сервера, запись запрещена
+MAX_REPLICA_STALENESS = 5.0  # Секунды отставания, после которых реплика отвечает 503
 
+# Одновременные запросы рекомендаций одного пользователя к одному снимку каталога считаются один раз
+recommendations_flight = SingleFlight()
 
-def save_file(data, filename):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# Ограничения одновременных запросов по группам маршрутов
+route_limits = RouteLimiter({'recommendations': 32, 'batch': 8, 'write': 16})
 
+# Под нагрузкой рекомендации отдаются из кэша последних результатов или усечёнными
+DEGRADED_RECOMMENDATIONS_LIMIT = 50
+RECOMMENDATIONS_CACHE_SIZE = 1024
+recommendations_cache = OrderedDict()
+recommendations_cache_lock = threading.Lock()
 
-users = load_file(USERS_FILE)
-positions = load_file(POSITIONS_FILE)
+# Диагностика памяти (--memory-budget / --memory-profile); без неё /debug/memory отвечает 404
+memory_monitor = None
+
+MAX_BATCH_SIZE = 100
+ADMIN_CLIENTS = ('127.0.0.1', '::1')  # Адреса, с которых доступны маршруты /admin/
+KEEPALIVE_TIMEOUT = 5.0  # Секунды простоя, после которых сервер закрывает соединение
+MAX_KEEPALIVE_REQUESTS = 100  # Запросов на одно соединение, после чего оно закрывается
+MAX_DISCARDED_BODY = 64 * 1024  # Непрочитанное тело больше этого не вычитывается: соединение закрывается
+STREAM_CHUNK_SIZE = 16 * 1024  # Размер одного чанка при потоковой отдаче, байт
+
+
+def iter_unviewed(user, catalog):
+    """Лениво перебирает непросмотренные позиции каталога для пользователя в порядке id.
+
+    Отсортированные id каталога вычитаются из просмотренных слиянием за O(n + m).
+    """
+    by_id = catalog.by_id
+    return (by_id[position_id] for position_id in as_viewed_set(user.get('viewed', [])).difference(catalog.ids))
+
+
+def cache_recommendations(user_id, catalog_version, ids):
+    with recommendations_cache_lock:
+        recommendations_cache[user_id] = (catalog_version, ids)
+        recommendations_cache.move_to_end(user_id)
+        while len(recommendations_cache) > RECOMMENDATIONS_CACHE_SIZE:
+            recommendations_cache.popitem(last=False)
+
+
+def cached_recommendations(user_id, catalog_version):
+    with recommendations_cache_lock:
+        cached = recommendations_cache.get(user_id)
+    if cached is None or cached[0] != catalog_version:
+        return None
+    return cached[1]
+
+
+def popular_unviewed(user, catalog, tag=None, window='popular'):
+    """Непросмотренные позиции из заранее посчитанного списка популярных"""
+    viewed_ids = as_viewed_set(user.get('viewed', []))
+    return [position_id for position_id in app.popularity.top(window, tag)
+            if position_id in catalog.fragments and position_id not in viewed_ids]
+
+
+def create_memory_monitor(budget=None, interval=10.0, trace_frames=0):
+    """Монитор памяти по структурам сервера: каталог, кэши и профили пользователей"""
+    # Монитор и tracemalloc нужны только с --memory-budget или --memory-profile
+    from app.memory import MemoryMonitor, catalog_sections
+    return MemoryMonitor(
+        {
+            'catalog': lambda: catalog_sections(app.catalog_manager.current()),
+            'caches': lambda: {'recommendations': recommendations_cache, 'popularity': app.popularity},
+        },
+        lambda: app.user_store,
+        budget=budget, interval=interval, trace_frames=trace_frames,
+    )
+
+
+def rerank_ids(ids, catalog, options):
+    """Разнообразит список id по тегам каталога; без параметров возвращает его как есть"""
+    if options is None:
+        return ids
+    by_id = catalog.by_id
+    return rerank.mmr(ids, lambda position_id: by_id[position_id]['tag'], **options)
+
+
+def recommended_ids(user, catalog):
+    """Id рекомендаций пользователя: популярное для пользователей без лайков, иначе непросмотренное"""
+    ids = popular_unviewed(user, catalog) if not user.get('like_categories') else None
+    return ids or [p['id'] for p in iter_unviewed(user, catalog)]
+
+
+def iter_batch_item(user_id, user, catalog):
+    """Элемент ответа /recommendations:batch по частям.
+
+    Позиции идут готовыми фрагментами каталога одна за другой: массив
+    рекомендаций пользователя не собирается в памяти целиком.
+    """
+    yield b'{"user_id":%d,"recommendations":[' % user_id
+    fragments = catalog.fragments
+    for i, position_id in enumerate(recommended_ids(user, catalog)):
+        if i:
+            yield b','
+        yield fragments[position_id]
+    yield b']}'
 
 
 class UserHandler(BaseHTTPRequestHandler):
-    def _send_json(self, data, status=200):
-        response = json.dumps(data).encode('utf-8')
+    """Обработчик HTTP/1.1 с постоянными соединениями.
+
+    Запросы одного соединения, в том числе отправленные конвейером без ожидания
+    ответов, обрабатываются по очереди. Соединение закрывается после
+    max_keepalive_requests запросов, после timeout секунд простоя или сразу,
+    если сервер перегружен и поток нужен другим клиентам.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    max_keepalive_requests = MAX_KEEPALIVE_REQUESTS
+    disable_nagle_algorithm = True  # Заголовки и тело уходят разными write: без этого ответ ждёт ACK
+
+    def setup(self):
+        super().setup()
+        self.requests_served = 0
+        self._body_read = False
+        self._body_length = 0
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._wait_for_request():
+            self.handle_one_request()
+
+    def _wait_for_request(self):
+        """Ждёт следующий запрос соединения; пул BoundedHTTPServer может закрыть простаивающее соединение"""
+        wait_for_request = getattr(self.server, 'wait_for_request', None)
+        return wait_for_request is None or wait_for_request(self.connection, self.rfile, self.timeout)
+
+    def end_headers(self):
+        if app.replica is not None:
+            lag = app.replica.lag()['lag_seconds']
+            self.send_header('X-Replica-Lag', 'unknown' if lag is None else f'{lag:.3f}')
+        if not self.close_connection:
+            if (self.requests_served >= self.max_keepalive_requests or self._body_length is None
+                    or self._under_pressure()):
+                self.send_header('Connection', 'close')
+            else:
+                remaining = self.max_keepalive_requests - self.requests_served
+                self.send_header('Keep-Alive', f'timeout={self.timeout:g}, max={remaining}')
+                if self.request_version == 'HTTP/1.0':
+                    self.send_header('Connection', 'keep-alive')
+        super().end_headers()
+
+    def _start_request(self):
+        """Учитывает очередной запрос соединения и продлевает срок его обработки"""
+        self.requests_served += 1
+        self._body_read = False
+        self._body_length = self._content_length()
+        local = getattr(self.server, 'local', None)
+        if self.requests_served > 1 and local is not None:
+            # Срок первого запроса считается от постановки соединения в очередь, следующих — от их прихода
+            local.deadline = time.monotonic() + self.server.request_timeout
+
+    def _content_length(self):
+        """Длина тела из Content-Length; None, если заголовок не число или отрицательный"""
+        value = self.headers.get('Content-Length', '0').strip()
+        if not (value.isascii() and value.isdigit()):
+            return None
+        return int(value)
+
+    def _discard_body(self):
+        """Вычитывает непрочитанное тело, иначе следующий запрос соединения прочитается с середины"""
+        if self._body_read or self.close_connection:
+            return
+        length = self._body_length
+        if length is None or length > MAX_DISCARDED_BODY:
+            # Где кончается тело, неизвестно или дорого узнать: соединение дальше не используется
+            self.close_connection = True
+        elif length:
+            self.rfile.read(length)
+
+    def _replica_unavailable(self):
+        """Отвечает 503, если реплика не синхронизирована или отстаёт сильнее допустимого"""
+        if app.replica is None:
+            return False
+        lag = app.replica.lag()['lag_seconds']
+        if app.replica.synced.is_set() and lag is not None and lag <= MAX_REPLICA_STALENESS:
+            return False
+        self._send_unavailable('Реплика отстаёт от первичного сервера')
+        return True
+
+    def _send_unavailable(self, message):
+        self._send_json({'error': message}, status=503, headers={'Retry-After': '1'})
+
+    def _deadline_exceeded(self):
+        """True, если срок обработки запроса, выставленный BoundedHTTPServer, уже истёк"""
+        deadline = getattr(getattr(self.server, 'local', None), 'deadline', None)
+        return deadline is not None and time.monotonic() > deadline
+
+    def _under_pressure(self):
+        under_pressure = getattr(self.server, 'under_pressure', None)
+        return under_pressure is not None and under_pressure()
+
+    @staticmethod
+    def _route_group(method, path):
+        if path.endswith('/recommendations'):
+            return 'recommendations'
+        if path in ('/users:batchGet', '/recommendations:batch'):
+            return 'batch'
+        if method == 'POST':
+            return 'write'
+        return None
+
+    def _handle_limited(self, method, handle):
+        """Выполняет обработчик с учётом срока запроса и лимита группы маршрутов"""
+        self._start_request()
+        try:
+            if self._deadline_exceeded():
+                self._send_unavailable('Истёк срок обработки запроса')
+                return
+            route = self._route_group(method, urlparse(self.path).path)
+            if not route_limits.acquire(route):
+                self._send_unavailable('Слишком много одновременных запросов')
+                return
+            try:
+                handle()
+            finally:
+                route_limits.release(route)
+        finally:
+            self._discard_body()
+
+    def _send_json(self, data, status=200, headers=None):
+        response = codec.dumps(data)
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Content-Length', str(len(response)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(response)
 
+    def _wants_ndjson(self):
+        query = parse_qs(urlparse(self.path).query)
+        if query.get('format') == ['ndjson']:
+            return True
+        return 'application/x-ndjson' in self.headers.get('Accept', '')
+
+    def _send_json_stream(self, items, status=200, headers=None):
+        """Отправляет элементы по мере их формирования.
+
+        Ответ — JSON-массив или NDJSON (?format=ndjson либо Accept: application/x-ndjson).
+        Клиентам HTTP/1.1 данные уходят чанками не больше STREAM_CHUNK_SIZE,
+        поэтому в памяти одновременно держится только один чанк.
+        """
+        ndjson = self._wants_ndjson()
+        chunked = self.request_version == 'HTTP/1.1'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-ndjson' if ndjson else 'application/json')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            # Без чанков и без длины конец ответа обозначается закрытием соединения
+            self.send_header('Connection', 'close')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        buffer = bytearray()
+        for piece in self._iter_fragments(items, ndjson):
+            buffer += piece
+            if len(buffer) >= STREAM_CHUNK_SIZE:
+                self._write_chunk(buffer, chunked)
+                buffer.clear()
+        if buffer:
+            self._write_chunk(buffer, chunked)
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+
+    @staticmethod
+    def _iter_fragments(items, ndjson):
+        """Кодирует элементы; готовые bytes (фрагменты каталога) идут как есть.
+
+        Элемент-генератор отдаёт bytes одного элемента по частям (см. iter_batch_item).
+        """
+        if not ndjson:
+            yield b'['
+        for i, item in enumerate(items):
+            if i and not ndjson:
+                yield b','
+            if isinstance(item, bytes):
+                yield item
+            elif isinstance(item, GeneratorType):
+                yield from item
+            else:
+                yield codec.dumps(item)
+            if ndjson:
+                yield b'\n'
+        if not ndjson:
+            yield b']'
+
+    def _write_chunk(self, data, chunked):
+        if chunked:
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        else:
+            self.wfile.write(data)
+
     def _read_body(self):
+        content_length = self._body_length
+        if content_length is None:
+            raise ValueError("Неверный заголовок Content-Length")
         try:
-            content_length = int(self.headers.get('Content-Length', 0))
             if content_length == 0:
                 raise ValueError("Пустое тело запроса")
             body = self.rfile.read(content_length)
-            return json.loads(body.decode('utf-8'))
+            self._body_read = True
+            return codec.loads(body)
         except Exception as e:
             raise ValueError(f"Неверный JSON: {str(e)}")
 
     def _find_user(self, user_id):
-        return next((u for u in users if u['id'] == user_id), None)
+        return app.user_store.get(user_id)
 
     def _find_position(self, position_id):
-        return next((p for p in positions if p['id'] == position_id), None)
+        return app.catalog_manager.current().by_id.get(position_id)
+
+    def _find_users(self, user_ids):
+        """Находит нескольких пользователей за одно обращение к каждому шарду"""
+        return app.user_store.get_many(user_ids)
+
+    def _read_id_list(self, field):
+        """Читает из тела запроса список целых id в поле field"""
+        body = self._read_body()
+        ids = body.get(field) if isinstance(body, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise ValueError(f"Поле {field} должно быть списком целых id")
+        if len(ids) > MAX_BATCH_SIZE:
+            raise ValueError(f"Не больше {MAX_BATCH_SIZE} id за запрос")
+        return ids
+
+    def _add_user_shard(self):
+        """Подключает новый файл-шард к хранилищу работающего сервера и переносит в него пользователей"""
+        if self.client_address[0] not in ADMIN_CLIENTS:
+            self._send_json({'error': 'Доступно только с локального адреса'}, status=403)
+            return
+        try:
+            body = self._read_body()
+            path = body.get('path') if isinstance(body, dict) else None
+            if not isinstance(path, str) or not path:
+                raise ValueError("Поле path должно быть путём к файлу")
+            moved = app.user_store.add_shard(path)
+        except ValueError as e:
+            self._send_json({'error': str(e)}, status=400)
+            return
+        self._send_json({'moved': moved, 'shards': [shard.path for shard in app.user_store.shards()]})
 
     def do_GET(self):
+        self._handle_limited('GET', self._handle_get)
+
+    def do_POST(self):
+        self._handle_limited('POST', self._handle_post)
+
+    def _handle_get(self):
         parsed = urlparse(self.path)
+        if parsed.path == '/metrics':
+            stats = getattr(self.server, 'stats', None)
+            self._send_json({
+                'server': stats() if stats is not None else None,
+                'routes': route_limits.stats(),
+                'recommendations_flight': {'executed': recommendations_flight.executed,
+                                           'shared': recommendations_flight.shared},
+            })
+            return
+
+        if parsed.path == '/debug/memory':
+            if memory_monitor is None:
+                self._send_json({'error': 'Диагностика памяти выключена'}, status=404)
+            else:
+                self._send_json(memory_monitor.report())
+            return
+
+        if parsed.path == '/replication/status':
+            if app.replica is None:
+                self._send_json({'role': 'primary'})
+            else:
+                self._send_json({'role': 'replica', 'primary': app.replica.address, **app.replica.lag()})
+            return
+
+        if self._replica_unavailable():
+            return
+
         match = re.match(r'^/users/(\d+)$', parsed.path)
         if match:
             user_id = int(match.group(1))
@@ -65,22 +419,83 @@ class UserHandler(BaseHTTPRequestHandler):
         match = re.match(r'^/users/(\d+)/recommendations$', parsed.path)
         if match:
             user_id = int(match.group(1))
+            try:
+                # ?diversity=0..1&limit=&pool= — переранжирование MMR по тегам
+                rerank_options = rerank.parse_options(parse_qs(parsed.query))
+            except ValueError as e:
+                self._send_json({'error': str(e)}, status=400)
+                return
+            # Версия читается до записи: результат может оказаться только свежее ключа
+            version = app.user_store.version(user_id)
             user = self._find_user(user_id)
             if not user:
                 self._send_json({'error': 'Пользователь не найден'}, status=404)
                 return
             # Примитивная логика: выдаем первые 5 непосещённых позиций
-            viewed_ids = user.get('viewed', [])
-            recommended = [p for p in positions if p['id'] not in viewed_ids]
-            self._send_json(recommended)
+            catalog = app.catalog_manager.current()
+            if not user.get('like_categories'):
+                # Холодный старт: без лайков рекомендуем популярное
+                ids = popular_unviewed(user, catalog)
+                if ids:
+                    ids = rerank_ids(ids, catalog, rerank_options)
+                    self._send_json_stream((catalog.fragments[position_id] for position_id in ids),
+                                           headers={'X-Recommendation-Source': 'popular'})
+                    return
+            if self._under_pressure():
+                self._send_degraded_recommendations(user_id, user, catalog)
+                return
+            ids = recommendations_flight.do(
+                (user_id, version, catalog.version),
+                lambda: [p['id'] for p in iter_unviewed(user, catalog)]
+            )
+            cache_recommendations(user_id, catalog.version, ids)
+            ids = rerank_ids(ids, catalog, rerank_options)
+            self._send_json_stream(catalog.fragments[position_id] for position_id in ids)
+            return
+
+        if parsed.path == '/popular':
+            query = parse_qs(parsed.query)
+            window = query.get('window', ['popular'])[0]
+            if window not in app.popularity.windows:
+                self._send_json({'error': 'Неизвестное окно популярности'}, status=400)
+                return
+            catalog = app.catalog_manager.current()
+            ids = popular_unviewed({}, catalog, query.get('tag', [None])[0], window)
+            self._send_json_stream(catalog.fragments[position_id] for position_id in ids)
             return
 
         self._send_json({'error': 'Не найдено'}, status=404)
 
-    def do_POST(self):
+    def _send_degraded_recommendations(self, user_id, user, catalog):
+        """Ответ под нагрузкой: последний посчитанный результат, популярное или первые позиции"""
+        ids = cached_recommendations(user_id, catalog.version)
+        if ids is not None:
+            self._send_json_stream((catalog.fragments[position_id] for position_id in ids),
+                                   headers={'X-Degraded': 'cached'})
+            return
+        ids = popular_unviewed(user, catalog)[:DEGRADED_RECOMMENDATIONS_LIMIT]
+        if ids:
+            self._send_json_stream((catalog.fragments[position_id] for position_id in ids),
+                                   headers={'X-Degraded': 'popular'})
+            return
+        truncated = (catalog.fragments[p['id']]
+                     for p in islice(iter_unviewed(user, catalog), DEGRADED_RECOMMENDATIONS_LIMIT))
+        self._send_json_stream(truncated, headers={'X-Degraded': 'truncated'})
+
+    def _handle_post(self):
         parsed = urlparse(self.path)
         path_parts = parsed.path.strip('/').split('/')
 
+        if app.replica is not None and parsed.path not in ('/users:batchGet', '/recommendations:batch'):
+            self._send_json({'error': 'Реплика доступна только для чтения'}, status=405)
+            return
+        if self._replica_unavailable():
+            return
+
+        if parsed.path == '/admin/shards':
+            self._add_user_shard()
+            return
+
         if parsed.path == '/users':
             try:
                 new_user = self._read_body()
@@ -93,17 +508,52 @@ class UserHandler(BaseHTTPRequestHandler):
                 if not isinstance(new_user['id'], int) or not isinstance(new_user['name'], str):
                     self._send_json({'error': 'Неверный тип для id или имени'}, status=400)
                     return
+                viewed = new_user['viewed']
+                if not isinstance(viewed, list) or not all(type(i) is int for i in viewed):
+                    self._send_json({'error': 'Поле viewed должно быть списком целых id'}, status=400)
+                    return
+                categories = (new_user['like_categories'], new_user['dislike_categories'])
+                if not all(isinstance(field, list) and all(isinstance(c, str) for c in field) for field in categories):
+                    self._send_json({'error': 'Категории должны быть списками строк'}, status=400)
+                    return
                 if self._find_user(new_user['id']):
                     self._send_json({'error': 'Пользователь уже существует'}, status=400)
                     return
 
-                users.append(new_user)
-                save_file(users, USERS_FILE)
+                app.user_store.add(new_user)
                 self._send_json({'message': 'Пользователь создан'}, status=201)
             except ValueError as e:
                 self._send_json({'error': str(e)}, status=400)
             return
 
+        elif parsed.path == '/users:batchGet':
+            try:
+                user_ids = self._read_id_list('ids')
+            except ValueError as e:
+                self._send_json({'error': str(e)}, status=400)
+                return
+            found = self._find_users(user_ids)
+            self._send_json_stream(
+                found.get(user_id) or {'id': user_id, 'error': 'Пользователь не найден'}
+                for user_id in user_ids
+            )
+            return
+
+        elif parsed.path == '/recommendations:batch':
+            try:
+                user_ids = self._read_id_list('user_ids')
+            except ValueError as e:
+                self._send_json({'error': str(e)}, status=400)
+                return
+            found = self._find_users(user_ids)
+            catalog = app.catalog_manager.current()
+            self._send_json_stream(
+                iter_batch_item(user_id, found[user_id], catalog)
+                if user_id in found else {'user_id': user_id, 'error': 'Пользователь не найден'}
+                for user_id in user_ids
+            )
+            return
+
         elif len(path_parts) == 5 and path_parts[0] == 'users' and path_parts[2] == 'movie':
             try:
                 user_id = int(path_parts[1])
@@ -136,8 +586,60 @@ class UserHandler(BaseHTTPRequestHandler):
 
 
 if __name__ == '__main__':
-    host = '0.0.0.0'
-    port = 8000
-    server = ThreadingHTTPServer((host, port), UserHandler)
-    print(f"Server running on http://{host}:{port}")
+    parser = argparse.ArgumentParser(description="HTTP-сервер рекомендаций")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--user-shards', nargs='+', default=USER_SHARD_FILES, metavar='PATH',
+                        help="Файлы-шарды пользователей; шарды из POST /admin/shards подключаются по манифесту")
+    parser.add_argument('--replication-listen', metavar='ADDR',
+                        help="Раздавать журнал изменений репликам (host:port или путь Unix-сокета)")
+    parser.add_argument('--replica-of', metavar='ADDR',
+                        help="Работать репликой только для чтения указанного первичного сервера")
+    parser.add_argument('--workers', type=int, default=16, help="Число потоков-обработчиков")
+    parser.add_argument('--queue-size', type=int, default=64, help="Длина очереди соединений")
+    parser.add_argument('--queue-timeout', type=float, default=2.0,
+                        help="Сколько секунд соединение может ждать в очереди")
+    parser.add_argument('--max-staleness', type=float, default=MAX_REPLICA_STALENESS,
+                        help="Допустимое отставание реплики, секунд")
+    parser.add_argument('--keepalive-timeout', type=float, default=KEEPALIVE_TIMEOUT,
+                        help="Сколько секунд держать простаивающее соединение")
+    parser.add_argument('--max-keepalive-requests', type=int, default=MAX_KEEPALIVE_REQUESTS,
+                        help="Сколько запросов обслуживать на одном соединении")
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help="Бюджет памяти на данные; давно не использованные профили вытесняются в файлы шардов")
+    parser.add_argument('--memory-profile', action='store_true',
+                        help="Включить tracemalloc и отладочный эндпоинт /debug/memory")
+    args = parser.parse_args()
+    app.users_paths = args.user_shards
+    UserHandler.timeout = args.keepalive_timeout
+    UserHandler.max_keepalive_requests = args.max_keepalive_requests
+
+    if args.replica_of:
+        from storage.replication import Replica
+        replica = Replica(args.replica_of)
+        replica.start()
+        app.use_replica(replica)
+        MAX_REPLICA_STALENESS = args.max_staleness
+    else:
+        User.SHARD_PATHS = args.user_shards
+    if args.memory_budget is not None or args.memory_profile:
+        # Запускается до загрузки данных, чтобы tracemalloc увидел их выделение
+        budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+        memory_monitor = create_memory_monitor(budget, trace_frames=1 if args.memory_profile else 0)
+        memory_monitor.start()
+    if app.replica is None:
+        # Пока сервер работает, storage.rebalance не сможет изменить его файлы
+        try:
+            app.user_store.claim()
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        if args.replication_listen:
+            from storage.replication import InteractionLog, ReplicationServer
+            replication_server = ReplicationServer(InteractionLog(app.user_store), args.replication_listen)
+            replication_server.start()
+            print(f"Replication log on {args.replication_listen}")
+    app.start()
+    server = BoundedHTTPServer((args.host, args.port), UserHandler, workers=args.workers,
+                               queue_size=args.queue_size, queue_timeout=args.queue_timeout)
+    print(f"Server running on http://{args.host}:{args.port}")
     server.serve_forever()
@@ -0,0 +1,143 @@
+import glob
+import os
+import threading
+from items.index import PositionIndex
+from storage import codec
+
+
+def file_signature(path):
+    """Возвращает (mtime, размер, inode) файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def resolve_source(path):
+    """Для каталога снимков возвращает самый свежий *.json, иначе сам путь"""
+    if os.path.isdir(path):
+        snapshots = sorted(glob.glob(os.path.join(path, '*.json')))
+        return snapshots[-1] if snapshots else None
+    return path
+
+
+class Catalog:
+    """Неизменяемый снимок каталога вместе с индексами и словарём тегов"""
+
+    def __init__(self, positions, version=0, source=None, signature=None, previous=None):
+        self.version = version
+        self.source = source
+        self.signature = signature
+        self.positions = tuple(positions)
+        self.records = tuple(position.to_dict() for position in self.positions)
+        self.by_id = {record['id']: record for record in self.records}
+        # Закодированные позиции: ответы собираются конкатенацией готовых байтов
+        self.fragments = {record['id']: codec.dumps(record) for record in self.records}
+        self.ids = tuple(sorted(self.by_id))
+        postings = {}
+        for position in self.positions:
+            for tag in position.get_tags():
+                postings.setdefault(tag, []).append(position.get_id())
+        self.postings = {tag: tuple(ids) for tag, ids in postings.items()}
+        self.tags = frozenset(self.postings)
+        if previous is not None:
+            self.index = previous.index.updated(self.positions)
+        else:
+            self.index = PositionIndex(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class CatalogManager:
+    """Следит за файлом (или каталогом снимков) позиций и подменяет снимок целиком.
+
+    Снимок перестраивает один поток за раз (фоновый или запрос, заметивший
+    изменение файла), а публикует одной заменой ссылки. Читатели его не ждут:
+    до публикации они получают прежний снимок, который остаётся неизменным.
+    """
+
+    def __init__(self, path, loader, poll_interval=1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.__loader = loader
+        self.__catalog = Catalog((), version=0)
+        self.__reload_lock = threading.Lock()  # Только для перестраивающих; читатели её не берут
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def current(self):
+        """Возвращает текущий снимок; без фонового потока сам проверяет файл.
+
+        Проверка — stat без блокировки. Заметив изменение, запрос перестраивает
+        снимок, только если этим не занят другой поток; ждёт он лишь первую загрузку.
+        """
+        catalog = self.__catalog
+        if self.__thread is None and self.__changed(catalog):
+            self.reload(wait=catalog.version == 0)
+        return self.__catalog
+
+    def __changed(self, catalog):
+        source = resolve_source(self.path)
+        signature = file_signature(source) if source else None
+        return source != catalog.source or signature != catalog.signature
+
+    def reload(self, force=False, wait=True):
+        """Перестраивает снимок, если источник изменился. Возвращает True при замене.
+
+        wait=False: если снимок уже перестраивает другой поток, сразу возвращает False.
+        """
+        if not self.__reload_lock.acquire(blocking=wait):
+            return False
+        try:
+            previous = self.__catalog
+            source = resolve_source(self.path)
+            signature = file_signature(source) if source else None
+            if not force and source == previous.source and signature == previous.signature:
+                return False
+            positions = self.__loader(source) if signature is not None else []
+            self.__catalog = Catalog(positions, version=previous.version + 1, source=source,
+                                     signature=signature, previous=previous)
+            return True
+        finally:
+            self.__reload_lock.release()
+
+    def start(self):
+        """Запускает фоновый поток, перестраивающий каталог при изменении файла"""
+        if self.__thread is not None:
+            return
+        self.reload()
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__watch, name='catalog-watcher', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is None:
+            return
+        self.__stop.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def __watch(self):
+        while not self.__stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # Битый или недописанный файл: оставляем прежний снимок
+                print(f"Не удалось перезагрузить каталог {self.path}: {e}")
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(path, loader):
+    """Возвращает общий для процесса CatalogManager для указанного пути"""
+    key = os.path.abspath(path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = CatalogManager(key, loader)
+            _managers[key] = manager
+        return manager
@@ -0,0 +1,32 @@
+class PositionIndex:
+    """Индекс позиций в памяти: id -> Position"""
+
+    def __init__(self, positions=()):
+        self.__positions = {}
+        self.update(positions)
+
+    def __len__(self):
+        return len(self.__positions)
+
+    def __contains__(self, position_id):
+        return position_id in self.__positions
+
+    def get(self, position_id):
+        """Возвращает позицию по id или None"""
+        return self.__positions.get(position_id)
+
+    def get_tags(self, position_id):
+        """Возвращает теги позиции или None, если позиции нет"""
+        position = self.__positions.get(position_id)
+        return position.get_tags() if position is not None else None
+
+    def ids(self):
+        return self.__positions.keys()
+
+    def updated(self, positions):
+        """Возвращает новый индекс для нового состояния каталога, не изменяя текущий"""
+        return PositionIndex(positions)
+
+    def update(self, positions):
+        """Заменяет содержимое индекса новым состоянием каталога"""
+        self.__positions = {position.get_id(): position for position in positions}
@@ -0,0 +1,121 @@
+import threading
+import time
+from itertools import islice
+
+# Веса взаимодействий при подсчёте популярности
+EVENT_WEIGHTS = {'viewed': 1.0, 'like': 3.0}
+
+# Окна с экспоненциальным затуханием: имя -> период полураспада, секунд
+DEFAULT_WINDOWS = {'trending': 3600.0, 'popular': 7 * 24 * 3600.0}
+
+
+class Popularity:
+    """Популярность позиций по просмотрам и лайкам с затуханием во времени.
+
+    События учитываются инкрементально в record(); списки top-N (общий и по
+    каждому тегу) пересчитываются фоновым потоком и читаются за O(1) через top().
+    observe() подписывается на изменения хранилища пользователей (UserStore или
+    ReplicaStore реплики) и учитывает новые просмотры и переданные с записью лайки.
+    """
+
+    def __init__(self, catalog_provider, windows=None, top_n=100, interval=60.0):
+        self.catalog_provider = catalog_provider
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.top_n = top_n
+        self.interval = interval
+        self.__scores = {window: {} for window in self.windows}  # id -> (счёт, время счёта)
+        self.__counted = {}  # id пользователя -> сколько его просмотров уже учтено
+        self.__lock = threading.Lock()
+        self.__rankings = {}  # (окно, тег или None) -> кортеж id
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def record(self, position_id, event, timestamp=None):
+        """Учитывает взаимодействие с позицией"""
+        weight = EVENT_WEIGHTS.get(event)
+        if not weight:
+            return
+        now = time.time() if timestamp is None else timestamp
+        with self.__lock:
+            for window, half_life in self.windows.items():
+                scores = self.__scores[window]
+                score, updated = scores.get(position_id, (0.0, now))
+                scores[position_id] = (self.__decay(score, now - updated, half_life) + weight, now)
+
+    def observe(self, record, interaction=None, timestamp=None):
+        """Учитывает изменение записи пользователя: просмотры, добавленные после прошлого
+        вызова, и взаимодействие (событие, id позиции), которого нет в самой записи.
+
+        Просмотры добавляются в конец истории, поэтому повторная запись того же
+        состояния (снимок реплики после переподключения) не учитывается дважды.
+        """
+        viewed = record.get('viewed') or ()
+        with self.__lock:
+            counted = self.__counted.get(record['id'], 0)
+            self.__counted[record['id']] = len(viewed)
+        for position_id in islice(viewed, counted, None):
+            self.record(position_id, 'viewed', timestamp)
+        if interaction is not None:
+            event, position_id = interaction
+            self.record(position_id, event, timestamp)
+
+    def seed(self, users, timestamp=None):
+        """Начальное наполнение по сохранённым историям просмотров"""
+        for user in users:
+            self.observe(user, timestamp=timestamp)
+
+    @staticmethod
+    def __decay(score, elapsed, half_life):
+        return score * 0.5 ** (max(elapsed, 0.0) / half_life)
+
+    def refresh(self, now=None):
+        """Пересчитывает списки top-N по всем окнам и тегам"""
+        now = time.time() if now is None else now
+        catalog = self.catalog_provider()
+        with self.__lock:
+            snapshot = {window: dict(scores) for window, scores in self.__scores.items()}
+        rankings = {}
+        for window, scores in snapshot.items():
+            half_life = self.windows[window]
+            current = {
+                position_id: self.__decay(score, now - updated, half_life)
+                for position_id, (score, updated) in scores.items()
+                if position_id in catalog.by_id
+            }
+            ranked = sorted(current, key=lambda position_id: (-current[position_id], position_id))
+            rankings[(window, None)] = tuple(ranked[:self.top_n])
+            by_tag = {}
+            for position_id in ranked:
+                for tag in catalog.by_id[position_id]['tag']:
+                    tag_ranking = by_tag.setdefault(tag, [])
+                    if len(tag_ranking) < self.top_n:
+                        tag_ranking.append(position_id)
+            for tag, ids in by_tag.items():
+                rankings[(window, tag)] = tuple(ids)
+        self.__rankings = rankings
+
+    def top(self, window='popular', tag=None):
+        """Готовый список id по убыванию популярности (пустой, если данных нет)"""
+        return self.__rankings.get((window, tag), ())
+
+    def start(self):
+        if self.__thread is not None:
+            return
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name='popularity', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is None:
+            return
+        self.__stop.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def __run(self):
+        while not self.__stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Ошибка одного пересчёта не останавливает поток: остаются прежние списки
+                print(f"Не удалось пересчитать популярность: {e}")
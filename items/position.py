@@ -1,9 +1,15 @@
-import json
-from user.user import User
+from items.catalog import get_manager
+from storage import codec
+from storage.singleflight import SingleFlight
+from storage.user_store import get_store
+from user.viewed import as_viewed_set
+
+_recommend_flight = SingleFlight()
 
 
 class Position:
     FILE_PATH = "./positions.json"  # Путь к файлу по умолчанию
+    USERS_FILE_PATH = "./users.json"  # Пользователи для get_recommend_position без явного хранилища
 
     def set_file_path(self, new_path):
         self.__FILE_PATH = new_path
@@ -22,67 +28,96 @@ class Position:
     def get_tags(self):
         return self.__tags
 
+    def to_dict(self):
+        """Конвертирует позицию в словарь в формате positions.json"""
+        return {"id": self.__id, "position_name": self.__name, "tag": self.__tags}
+
     @staticmethod
-    def read_file():
+    def read_file(file_path=None):
         """Считывает позиции из файла и возвращает список объектов Position"""
         positions = []
         try:
-            with open(Position.FILE_PATH, 'r', encoding='utf-8') as f:
+            with open(file_path or Position.FILE_PATH, 'rb') as f:
                 content = f.read()
-                temp = json.loads(content) if content else []
-            for item in temp:
-                position = Position(item['id'], item['position_name'], item['tag'])
-                positions.append(position)
+            for item in codec.decode_positions(content):
+                positions.append(Position(*item))
         except FileNotFoundError:
             return []
         return positions
 
+    @staticmethod
+    def get_manager():
+        """Возвращает менеджер каталога для текущего FILE_PATH"""
+        return get_manager(Position.FILE_PATH, lambda path: Position.read_file(path))
+
+    @staticmethod
+    def get_index():
+        """Возвращает индекс позиций из актуального снимка каталога"""
+        return Position.get_manager().current().index
+
     def __str__(self):
         return f"{self.__id}  {self.__name} {self.__tags}"
 
     @staticmethod
     def get_category_by_position_id(item_id):
-        positions = Position.read_file()
-        for position in positions:
-            if position.__id == item_id:
-                return position.__tags
-
-        return "Позиция не найдена"
+        tags = Position.get_index().get_tags(item_id)
+        if tags is None:
+            return "Позиция не найдена"
+        return tags
 
     @staticmethod
     def get_position_by_id(id):
         """Возвращает позицию по id"""
-        positions = Position.read_file()
-        for position in positions:
-            if position.__id == id:
-                return position
-        return "Позиция не найдена"
+        position = Position.get_index().get(id)
+        if position is None:
+            return "Позиция не найдена"
+        return position
 
     @staticmethod
-    def get_recommend_position(user_id):
-        try:
-            likes = User.get_user_by_id(user_id)._User__likes
-            dislikes = User.get_user_by_id(user_id)._User__dislikes
-            viewed = User.get_user_by_id(user_id)._User__viewed
-            positions = Position.read_file()
-            recommend_positions = []
-            for position in positions:
-                in_dislikes = False
-                in_viewed = False
-
-                if position.__id in viewed:
-                    in_viewed = True
-
-                for tag in position.__tags:
-                    if tag in dislikes:
-                        in_dislikes = True
-                        break
-
-                if not in_dislikes and not in_viewed and tag in likes:
-                    recommend_positions.append(position)
-
-            return recommend_positions
-        except AttributeError:
-            return "Пользователь не найден"
-        except TypeError:
+    def get_recommend_position(user_id, store=None):
+        """Рекомендации по тегам для пользователя из store (по умолчанию — USERS_FILE_PATH).
+
+        Одновременные одинаковые запросы считаются один раз.
+        """
+        if store is None:
+            store = get_store([Position.USERS_FILE_PATH])
+        catalog = Position.get_manager().current()
+        key = (catalog.source, catalog.version, user_id, store.version(user_id))
+        positions = _recommend_flight.do(
+            key, lambda: Position.__collect_recommendations(store.get(user_id), catalog))
+        if positions is None:
             return "Пользователь не найден"
+        return list(positions)
+
+    @staticmethod
+    def recommend_ids(user, catalog):
+        """Id рекомендуемых позиций по записи пользователя (словарь в формате users.json)"""
+        return [position.__id for position in Position.__collect_recommendations(user, catalog)]
+
+    @staticmethod
+    def __collect_recommendations(user, catalog):
+        """Рекомендуемые позиции по записи пользователя; None, если пользователя нет"""
+        if user is None:
+            return None
+        return Position.__select(catalog, user.get('like_categories', []), user.get('dislike_categories', []),
+                                 as_viewed_set(user.get('viewed', [])))
+
+    @staticmethod
+    def __select(catalog, likes, dislikes, viewed):
+        recommend_positions = []
+        for position in catalog.positions:
+            in_dislikes = False
+            in_viewed = False
+
+            if position.__id in viewed:
+                in_viewed = True
+
+            for tag in position.__tags:
+                if tag in dislikes:
+                    in_dislikes = True
+                    break
+
+            if not in_dislikes and not in_viewed and tag in likes:
+                recommend_positions.append(position)
+
+        return recommend_positions
@@ -0,0 +1,61 @@
+from itertools import islice
+
+DEFAULT_POOL = 200  # Сколько первых кандидатов участвует в переранжировании
+MAX_POOL = 1000
+DEFAULT_LIMIT = 20
+
+
+def jaccard(left, right):
+    """Сходство двух множеств тегов: доля общих тегов"""
+    if not left or not right:
+        return 0.0
+    common = len(left & right)
+    return common / (len(left) + len(right) - common)
+
+
+def mmr(candidates, tags, k=DEFAULT_LIMIT, diversity=0.5, pool=DEFAULT_POOL):
+    """Переранжирование Maximal Marginal Relevance по тегам.
+
+    Берёт первые pool кандидатов (порядок = релевантность) и жадно выбирает k,
+    штрафуя за сходство с уже выбранными. diversity=0 сохраняет исходный
+    порядок, 1 — только разнообразие. Для каждого кандидата хранится
+    максимальное сходство с выбранными и обновляется после каждого выбора,
+    поэтому стоимость O(k·pool), а не квадратичная по каталогу.
+    tags — функция, возвращающая теги кандидата.
+    """
+    if not 0.0 <= diversity <= 1.0:
+        raise ValueError("diversity должен быть от 0 до 1")
+    pool_items = list(islice(candidates, pool))
+    size = len(pool_items)
+    tag_sets = [frozenset(tags(item)) for item in pool_items]
+    scores = [(1.0 - diversity) * (1.0 - i / size) for i in range(size)]  # Релевантность по позиции
+    max_similarity = [0.0] * size
+    remaining = list(range(size))
+    selected = []
+    while remaining and len(selected) < k:
+        best = max(remaining, key=lambda i: scores[i] - diversity * max_similarity[i])
+        remaining.remove(best)
+        selected.append(best)
+        chosen = tag_sets[best]
+        for i in remaining:
+            similarity = jaccard(tag_sets[i], chosen)
+            if similarity > max_similarity[i]:
+                max_similarity[i] = similarity
+    return [pool_items[i] for i in selected]
+
+
+def parse_options(query):
+    """Параметры переранжирования из query-строки (parse_qs) или None, если diversity не задан"""
+    if 'diversity' not in query:
+        return None
+    try:
+        diversity = float(query['diversity'][0])
+        limit = int(query.get('limit', [DEFAULT_LIMIT])[0])
+        pool = int(query.get('pool', [max(DEFAULT_POOL, limit)])[0])
+    except ValueError:
+        raise ValueError("diversity, limit и pool должны быть числами")
+    if not 0.0 <= diversity <= 1.0:
+        raise ValueError("diversity должен быть от 0 до 1")
+    if limit < 1 or not limit <= pool <= MAX_POOL:
+        raise ValueError(f"Нужно 1 <= limit <= pool <= {MAX_POOL}")
+    return {'diversity': diversity, 'k': limit, 'pool': pool}
@@ -0,0 +1,137 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from items.catalog import Catalog
+from items.position import Position
+from storage import codec
+from storage.user_store import UserStore
+
+CHECKPOINT_FILE = '_checkpoint.json'
+
+# Каталог воркера: при fork наследуется от родителя, иначе читается в initializer один раз
+_catalog = None
+
+
+def _init_worker(positions_path):
+    global _catalog
+    if _catalog is None:
+        _catalog = Catalog(Position.read_file(positions_path), source=positions_path)
+
+
+def partition_path(out_dir, partition):
+    return os.path.join(out_dir, f'part-{partition:05d}.jsonl')
+
+
+def partition_users(users, partitions):
+    """Раскладывает пользователей по партициям по id: состав партиции не зависит от порядка в файле"""
+    parts = [[] for _ in range(partitions)]
+    for user in users:
+        parts[user['id'] % partitions].append(user)
+    for part in parts:
+        part.sort(key=lambda user: user['id'])
+    return parts
+
+
+def _run_partition(partition, users, out_dir):
+    """Считает рекомендации одной партиции и атомарно записывает её JSONL-файл"""
+    path = partition_path(out_dir, partition)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for user in users:
+            ids = Position.recommend_ids(user, _catalog)
+            f.write(codec.dumps({'user_id': user['id'], 'recommendations': ids}) + b'\n')
+    os.replace(tmp_path, path)
+    return partition, len(users)
+
+
+def load_checkpoint(out_dir, partitions):
+    """Номера уже записанных партиций; чекпоинт другого разбиения считается ошибкой"""
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'rb') as f:
+        checkpoint = codec.loads(f.read())
+    if checkpoint['partitions'] != partitions:
+        raise ValueError(f"Чекпоинт записан для {checkpoint['partitions']} партиций, а не {partitions}")
+    return {partition for partition in checkpoint['done'] if os.path.exists(partition_path(out_dir, partition))}
+
+
+def save_checkpoint(out_dir, partitions, done):
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(codec.dumps({'partitions': partitions, 'done': sorted(done)}))
+    os.replace(path + '.tmp', path)
+
+
+def run(user_paths, positions_path, out_dir, workers=None, partitions=64, progress=None):
+    """Считает рекомендации всех пользователей в пуле процессов.
+
+    Пользователи делятся на partitions партиций, каждая пишется в свой файл
+    part-NNNNN.jsonl. Готовые партиции отмечаются в чекпоинте, и повторный
+    запуск с тем же out_dir пропускает их. Возвращает статистику прогона.
+    """
+    global _catalog
+    os.makedirs(out_dir, exist_ok=True)
+    done = load_checkpoint(out_dir, partitions)
+    store = UserStore(user_paths, reload_on_change=False)
+    store.load()
+    parts = partition_users(store.all(), partitions)
+    pending = [partition for partition in range(partitions) if partition not in done]
+    total_users = sum(len(parts[partition]) for partition in pending)
+
+    # Каталог читается до создания пула: воркеры, созданные через fork, получают его без повторного чтения
+    _catalog = Catalog(Position.read_file(positions_path), source=positions_path)
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+    started = time.perf_counter()
+    processed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                                 initializer=_init_worker, initargs=(positions_path,)) as executor:
+            futures = [executor.submit(_run_partition, partition, parts[partition], out_dir)
+                       for partition in pending]
+            for future in as_completed(futures):
+                partition, count = future.result()
+                done.add(partition)
+                save_checkpoint(out_dir, partitions, done)
+                processed += count
+                if progress is not None:
+                    elapsed = time.perf_counter() - started
+                    progress(len(done), partitions, processed, total_users, elapsed)
+    finally:
+        _catalog = None
+    elapsed = time.perf_counter() - started
+    return {
+        'partitions': partitions,
+        'skipped': partitions - len(pending),
+        'users': processed,
+        'seconds': elapsed,
+        'users_per_second': processed / elapsed if elapsed else 0.0,
+    }
+
+
+def _print_progress(done, partitions, processed, total_users, elapsed):
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"партиций {done}/{partitions}, пользователей {processed}/{total_users}, {rate:.0f} польз./с",
+          file=sys.stderr)
+
+
+def main(argv=None):
+    """Ночной расчёт рекомендаций для всех пользователей"""
+    parser = argparse.ArgumentParser(description="Пакетный расчёт рекомендаций в JSONL")
+    parser.add_argument('--users', nargs='+', default=['./users.json'], help="Файлы-шарды пользователей")
+    parser.add_argument('--positions', default='./positions.json', help="Файл позиций")
+    parser.add_argument('--out', required=True, help="Каталог для part-*.jsonl и чекпоинта")
+    parser.add_argument('--workers', type=int, default=None, help="Число процессов (по умолчанию по числу CPU)")
+    parser.add_argument('--partitions', type=int, default=64, help="Число выходных файлов")
+    args = parser.parse_args(argv)
+
+    stats = run(args.users, args.positions, args.out, args.workers, args.partitions, _print_progress)
+    print(f"Готово: {stats['users']} пользователей за {stats['seconds']:.2f} c "
+          f"({stats['users_per_second']:.0f} польз./с), пропущено партиций: {stats['skipped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import queue
+import select
+import socket
+import threading
+import time
+from http.server import HTTPServer
+from storage import codec
+
+IDLE_POLL_INTERVAL = 0.05  # Как часто простаивающее соединение проверяет, не ждут ли другие
+
+
+def write_unavailable(sock, message, retry_after=1, send_timeout=1.0):
+    """Отвечает 503 с Retry-After прямо в сокет, не создавая обработчик"""
+    body = codec.dumps({'error': message})
+    response = (
+        'HTTP/1.1 503 Service Unavailable\r\n'
+        'Content-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        f'Retry-After: {retry_after}\r\n'
+        'Connection: close\r\n\r\n'
+    ).encode('ascii') + body
+    try:
+        # Вычитываем уже пришедший запрос, иначе клиент может получить RST вместо ответа; не ждём его
+        sock.settimeout(0)
+        try:
+            sock.recv(65536)
+        except OSError:
+            pass
+        sock.settimeout(send_timeout)
+        sock.sendall(response)
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+class BoundedHTTPServer(HTTPServer):
+    """HTTP-сервер с фиксированным пулом потоков и ограниченной очередью соединений.
+
+    Когда очередь заполнена, соединение сразу получает 503 вместо ожидания;
+    ответ пишет отдельный поток, чтобы не задерживать приём соединений.
+    Соединение, простоявшее в очереди дольше queue_timeout, тоже отклоняется.
+    Постоянное соединение держит поток только пока ждать его некому: см. wait_for_request.
+    """
+
+    def __init__(self, server_address, handler_class, workers=16, queue_size=64,
+                 queue_timeout=2.0, request_timeout=10.0):
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.local = threading.local()
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__lock = threading.Lock()
+        self.__busy = 0
+        self.accepted = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+        self.__rejected = queue.Queue(maxsize=queue_size)
+        self.__threads = [
+            threading.Thread(target=self.__work, name=f'http-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        self.__threads.append(threading.Thread(target=self.__reject, name='http-rejector', daemon=True))
+        for thread in self.__threads:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self.__queue.put_nowait((request, client_address, time.monotonic()))
+        except queue.Full:
+            with self.__lock:
+                self.shed_queue_full += 1
+            try:
+                self.__rejected.put_nowait(request)
+            except queue.Full:
+                # Не успеваем даже отказывать: закрываем без ответа
+                self.shutdown_request(request)
+            return
+        with self.__lock:
+            self.accepted += 1
+
+    def __reject(self):
+        while True:
+            request = self.__rejected.get()
+            if request is None:
+                return
+            write_unavailable(request, 'Сервер перегружен')
+            self.shutdown_request(request)
+
+    def __work(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            request, client_address, enqueued_at = item
+            if time.monotonic() - enqueued_at > self.queue_timeout:
+                with self.__lock:
+                    self.shed_deadline += 1
+                write_unavailable(request, 'Истёк срок ожидания в очереди')
+                self.shutdown_request(request)
+                continue
+            with self.__lock:
+                self.__busy += 1
+            self.local.deadline = enqueued_at + self.request_timeout
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.local.deadline = None
+                with self.__lock:
+                    self.__busy -= 1
+                self.shutdown_request(request)
+
+    def wait_for_request(self, sock, rfile, idle_timeout):
+        """Ждёт следующий запрос постоянного соединения не дольше idle_timeout секунд.
+
+        Возвращает False, если запрос не пришёл или в очереди ждут соединения,
+        а свободных потоков нет: простаивающее соединение закрывается и
+        освобождает поток, вместо того чтобы новые клиенты получали 503.
+        """
+        deadline = time.monotonic() + idle_timeout
+        timeout = sock.gettimeout()
+        try:
+            # Запрос, отправленный конвейером, мог уже оказаться в буфере rfile
+            sock.settimeout(0)
+            try:
+                if rfile.peek(1):
+                    return True
+            finally:
+                sock.settimeout(timeout)
+            while True:
+                if self.__queue.qsize() and self.__busy >= self.workers:
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                readable, _, _ = select.select([sock], [], [], min(IDLE_POLL_INTERVAL, remaining))
+                if readable:
+                    return True
+        except (OSError, ValueError):
+            return False
+
+    def under_pressure(self):
+        """True, если очередь соединений заполнена хотя бы наполовину"""
+        return self.__queue.qsize() * 2 >= self.queue_size
+
+    def stats(self):
+        with self.__lock:
+            return {
+                'workers': self.workers,
+                'busy_workers': self.__busy,
+                'queue_depth': self.__queue.qsize(),
+                'queue_size': self.queue_size,
+                'accepted': self.accepted,
+                'shed_queue_full': self.shed_queue_full,
+                'shed_deadline': self.shed_deadline,
+            }
+
+    def server_close(self):
+        super().server_close()
+        for _ in range(self.workers):
+            self.__queue.put(None)
+        self.__rejected.put(None)
+
+
+class RouteLimiter:
+    """Ограничивает число одновременных запросов к каждой группе маршрутов"""
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self.__semaphores = {route: threading.BoundedSemaphore(limit) for route, limit in limits.items()}
+        self.__lock = threading.Lock()
+        self.in_flight = {route: 0 for route in limits}
+        self.shed = {route: 0 for route in limits}
+
+    def acquire(self, route):
+        """Занимает слот маршрута; False, если все слоты заняты"""
+        semaphore = self.__semaphores.get(route)
+        if semaphore is None:
+            return True
+        with self.__lock:
+            if not semaphore.acquire(blocking=False):
+                self.shed[route] += 1
+                return False
+            self.in_flight[route] += 1
+            return True
+
+    def release(self, route):
+        semaphore = self.__semaphores.get(route)
+        if semaphore is None:
+            return
+        with self.__lock:
+            self.in_flight[route] -= 1
+            semaphore.release()
+
+    def stats(self):
+        with self.__lock:
+            return {route: {'limit': self.limits[route], 'in_flight': self.in_flight[route],
+                            'shed': self.shed[route]} for route in self.limits}
@@ -0,0 +1,113 @@
+"""Кодек JSON: orjson или msgspec, если установлены, иначе стандартный json.
+
+Все функции работают с bytes и пишут компактный JSON без отступов.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _default(obj):
+    """Сериализует объекты с методом to_list (например, ViewedSet)"""
+    if hasattr(obj, 'to_list'):
+        return obj.to_list()
+    raise TypeError(f"Тип {type(obj).__name__} не сериализуется в JSON")
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+_BACKENDS = {'json': (_json_dumps, _json_loads)}
+
+if msgspec is not None:
+    _msgspec_encoder = msgspec.json.Encoder(enc_hook=_default)
+
+    class PositionStruct(msgspec.Struct):
+        id: int
+        position_name: str
+        tag: list[str]
+
+    class UserStruct(msgspec.Struct):
+        id: int
+        name: str
+        like_categories: list[str]
+        dislike_categories: list[str]
+        viewed: list[int]
+
+    _position_decoder = msgspec.json.Decoder(list[PositionStruct])
+    _user_decoder = msgspec.json.Decoder(list[UserStruct])
+    _BACKENDS['msgspec'] = (_msgspec_encoder.encode, msgspec.json.decode)
+
+if orjson is not None:
+    _BACKENDS['orjson'] = (lambda obj: orjson.dumps(obj, default=_default), orjson.loads)
+
+BACKEND = 'orjson' if orjson is not None else 'msgspec' if msgspec is not None else 'json'
+_dumps, _loads = _BACKENDS[BACKEND]
+
+
+def use_backend(name):
+    """Переключает реализацию кодека ('json', 'orjson', 'msgspec')"""
+    global BACKEND, _dumps, _loads
+    if name not in _BACKENDS:
+        raise ValueError(f"Кодек {name} недоступен")
+    BACKEND = name
+    _dumps, _loads = _BACKENDS[name]
+
+
+def dumps(obj):
+    """Кодирует объект в компактный JSON (bytes, UTF-8)"""
+    return _dumps(obj)
+
+
+def loads(data):
+    """Декодирует JSON из bytes или str"""
+    return _loads(data)
+
+
+def read_file(path):
+    """Читает JSON-файл; пустой файл даёт пустой список"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return loads(content) if content.strip() else []
+
+
+def write_file(path, data):
+    """Записывает данные в файл компактным JSON"""
+    with open(path, 'wb') as f:
+        f.write(dumps(data))
+
+
+def decode_positions(content):
+    """Декодирует positions.json в кортежи (id, position_name, tag).
+
+    С msgspec документ разбирается сразу в типизированные структуры.
+    """
+    if not content.strip():
+        return []
+    if BACKEND == 'msgspec':
+        return [(p.id, p.position_name, p.tag) for p in _position_decoder.decode(content)]
+    return [(p['id'], p['position_name'], p['tag']) for p in loads(content)]
+
+
+def decode_users(content):
+    """Декодирует users.json в кортежи (id, name, like, dislike, viewed)"""
+    if not content.strip():
+        return []
+    if BACKEND == 'msgspec':
+        return [(u.id, u.name, u.like_categories, u.dislike_categories, u.viewed)
+                for u in _user_decoder.decode(content)]
+    return [(u['id'], u['name'], u['like_categories'], u['dislike_categories'], u['viewed'])
+            for u in loads(content)]
@@ -0,0 +1,32 @@
+import argparse
+import sys
+import time
+from storage.user_store import UserStore
+
+
+def main(argv=None):
+    """Подключает новый шард пользователей и переносит в него часть записей.
+
+    Работает только с файлами, которыми не владеет запущенный сервер: у работающего
+    сервера шард добавляется через POST /admin/shards.
+    """
+    parser = argparse.ArgumentParser(description="Ребалансировка шардов users.json")
+    parser.add_argument('--shards', nargs='+', required=True, help="Текущие файлы-шарды")
+    parser.add_argument('--add', nargs='+', required=True, help="Новые файлы-шарды")
+    args = parser.parse_args(argv)
+
+    store = UserStore(args.shards)
+    try:
+        store.claim()
+    except ValueError as e:
+        sys.exit(f"{e}. Шарды работающего сервера добавляются через POST /admin/shards")
+    store.load()
+    for path in args.add:
+        started = time.perf_counter()
+        moved = store.add_shard(path)
+        print(f"{path}: перенесено {moved} пользователей за {time.perf_counter() - started:.2f} c")
+    print("Шарды: " + " ".join(shard.path for shard in store.shards()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import collections
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from storage import codec
+from storage.user_store import with_viewed_set
+
+HEARTBEAT_INTERVAL = 1.0  # Секунды между heartbeat-сообщениями первичного сервера
+
+
+def parse_address(address):
+    """'host:port' — TCP, любой другой путь — Unix-сокет"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    return socket.AF_UNIX, address
+
+
+class InteractionLog:
+    """Журнал изменений пользователей на первичном сервере.
+
+    Каждое изменение — полная новая запись пользователя с порядковым номером,
+    поэтому повторное применение события безопасно. Последние события хранятся
+    в памяти, чтобы переподключившаяся реплика могла догнать журнал без снимка.
+    log_id отличает журналы разных запусков первичного сервера: номера событий
+    нового журнала снова начинаются с 1.
+    """
+
+    def __init__(self, store, capacity=10000):
+        self.store = store
+        self.log_id = uuid.uuid4().hex
+        self.seq = 0
+        self.__events = collections.deque(maxlen=capacity)
+        self.__subscribers = []
+        self.__lock = threading.Lock()
+        store.subscribe(self.append)
+
+    def append(self, record, interaction=None):
+        with self.__lock:
+            self.seq += 1
+            event = {'op': 'upsert', 'seq': self.seq, 'ts': time.time(), 'user': record}
+            if interaction is not None:
+                event['interaction'] = interaction
+            self.__events.append(event)
+            for subscriber in list(self.__subscribers):
+                subscriber(event)
+
+    def subscribe(self, callback, since=None, log_id=None):
+        """Подписывает callback на события после since журнала log_id; возвращает события для догона.
+
+        Если журнал другой или нужных событий в памяти уже нет, первым возвращается
+        снимок всех пользователей.
+        """
+        with self.__lock:
+            self.__subscribers.append(callback)
+            seq = self.seq
+            oldest = self.__events[0]['seq'] if self.__events else seq + 1
+            if since is not None and log_id == self.log_id and oldest - 1 <= since <= seq:
+                return [event for event in self.__events if event['seq'] > since]
+        # Снимок читается вне блокировки журнала (писатели держат блокировку шарда и ждут журнал).
+        # Изменения, попавшие и в снимок, и в очередь после него, применятся повторно без вреда.
+        return [{'op': 'snapshot', 'seq': seq, 'ts': time.time(), 'log': self.log_id, 'users': self.store.all()}]
+
+    def unsubscribe(self, callback):
+        with self.__lock:
+            if callback in self.__subscribers:
+                self.__subscribers.remove(callback)
+
+
+class _ReplicationHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        log = self.server.log
+        hello = codec.loads(self.rfile.readline() or b'{}')
+        events = queue.Queue(maxsize=self.server.max_pending)
+
+        def push(event):
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                # Реплика не успевает: рвём соединение, после переподключения она получит снимок
+                events.queue.clear()
+                events.put_nowait(None)
+
+        try:
+            for event in log.subscribe(push, hello.get('since'), hello.get('log')):
+                self.__send(event)
+            while not self.server.stopped.is_set():
+                try:
+                    event = events.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    event = {'op': 'heartbeat', 'seq': log.seq, 'ts': time.time()}
+                if event is None:
+                    break
+                self.__send(event)
+        except OSError:
+            pass
+        finally:
+            log.unsubscribe(push)
+
+    def __send(self, event):
+        self.wfile.write(codec.dumps(event) + b'\n')
+
+
+class ReplicationServer:
+    """Раздаёт журнал изменений репликам через локальный сокет (NDJSON)"""
+
+    def __init__(self, log, address, max_pending=10000):
+        family, bind_address = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            os.remove(bind_address)
+        server_class = socketserver.ThreadingUnixStreamServer if family == socket.AF_UNIX \
+            else socketserver.ThreadingTCPServer
+        server_class.allow_reuse_address = True
+        self.__server = server_class(bind_address, _ReplicationHandler)
+        self.__server.daemon_threads = True
+        self.__server.log = log
+        self.__server.max_pending = max_pending
+        self.__server.stopped = threading.Event()
+        self.address = self.__server.server_address
+        self.__thread = None
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name='replication', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__server.stopped.set()
+        self.__server.shutdown()
+        self.__server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+
+
+class ReplicaStore:
+    """Хранилище пользователей реплики только в памяти, с тем же интерфейсом чтения, что у UserStore"""
+
+    def __init__(self):
+        self.__records = {}
+        self.__versions = {}
+        self.__generation = 0
+        self.__listeners = []
+
+    def subscribe(self, callback):
+        """callback(запись, взаимодействие) вызывается для каждой записи из журнала, как у UserStore.subscribe"""
+        self.__listeners.append(callback)
+
+    def __notify(self, record, interaction=None):
+        for callback in self.__listeners:
+            callback(record, interaction)
+
+    def get(self, user_id):
+        return self.__records.get(user_id)
+
+    def version(self, user_id):
+        """Номер события журнала, последним изменившего пользователя"""
+        return self.__versions.get(user_id, self.__generation)
+
+    def get_many(self, user_ids):
+        records = self.__records
+        return {user_id: records[user_id] for user_id in set(user_ids) if user_id in records}
+
+    def all(self):
+        return list(self.__records.values())
+
+    def ids(self):
+        return set(self.__records)
+
+    def replace_all(self, records, version=0):
+        records = (with_viewed_set(record) for record in records)
+        self.__records = {record['id']: record for record in records}
+        self.__versions = {}
+        self.__generation = version
+        for record in self.__records.values():
+            self.__notify(record)
+
+    def put(self, record, version=0, interaction=None):
+        record = with_viewed_set(record)
+        self.__records[record['id']] = record
+        self.__versions[record['id']] = version
+        self.__notify(record, interaction)
+
+
+class Replica:
+    """Подключается к первичному серверу и применяет его журнал к ReplicaStore"""
+
+    def __init__(self, address, store=None, reconnect_interval=1.0):
+        self.address = address
+        self.store = store if store is not None else ReplicaStore()
+        self.reconnect_interval = reconnect_interval
+        self.applied_seq = 0
+        self.primary_seq = 0
+        self.log_id = None  # Журнал первичного сервера, из снимка которого построено состояние
+        self.last_event_ts = None
+        self.last_message_at = None
+        self.connected = False
+        self.synced = threading.Event()  # Установлен, когда реплика догнала первичный сервер
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__socket = None
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__run, name='replica', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.__socket is not None:
+            try:
+                self.__socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def lag(self):
+        """Отставание реплики: в событиях и в секундах с момента последнего сообщения"""
+        now = time.time()
+        seconds = None if self.last_message_at is None else now - self.last_message_at
+        if self.applied_seq < self.primary_seq and self.last_event_ts is not None:
+            seconds = max(seconds or 0.0, now - self.last_event_ts)
+        return {
+            'connected': self.connected,
+            'applied_seq': self.applied_seq,
+            'primary_seq': self.primary_seq,
+            'seq_lag': max(0, self.primary_seq - self.applied_seq),
+            'lag_seconds': seconds,
+        }
+
+    def apply(self, event):
+        op = event['op']
+        if op == 'snapshot':
+            # Снимок мог прийти от перезапущенного первичного сервера с меньшими номерами событий
+            self.synced.clear()
+            self.store.replace_all(event['users'], event['seq'])
+            self.log_id = event.get('log')
+            self.primary_seq = event['seq']
+        elif op == 'upsert':
+            self.store.put(event['user'], event['seq'], event.get('interaction'))
+        if op != 'heartbeat':
+            self.applied_seq = event['seq']
+            self.last_event_ts = event['ts']
+        self.primary_seq = max(self.primary_seq, event['seq'])
+        self.last_message_at = time.time()
+        if self.applied_seq >= self.primary_seq:
+            self.synced.set()
+
+    def __run(self):
+        while not self.__stop.is_set():
+            family, address = parse_address(self.address)
+            try:
+                with socket.socket(family, socket.SOCK_STREAM) as sock:
+                    sock.connect(address)
+                    self.__socket = sock
+                    self.connected = True
+                    # До первого снимка состояния нет, догонять журнал не с чего
+                    hello = {'since': self.applied_seq, 'log': self.log_id} if self.last_event_ts is not None else {}
+                    sock.sendall(codec.dumps(hello) + b'\n')
+                    with sock.makefile('rb') as stream:
+                        for line in stream:
+                            self.apply(codec.loads(line))
+            except OSError:
+                pass
+            finally:
+                self.connected = False
+                self.__socket = None
+                # Без соединения отставание неизвестно: чтение снова разрешится после догона журнала
+                self.synced.clear()
+            self.__stop.wait(self.reconnect_interval)
@@ -0,0 +1,43 @@
+import hashlib
+from bisect import bisect
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Кольцо консистентного хеширования с виртуальными узлами"""
+
+    def __init__(self, nodes=(), replicas=128):
+        self.replicas = replicas
+        self.__points = []
+        self.__owners = []
+        self.nodes = []
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        points = sorted(zip(self.__points, self.__owners))
+        for i in range(self.replicas):
+            points.append((_hash(f"{node}#{i}"), node))
+        points.sort()
+        self.__points = [point for point, _ in points]
+        self.__owners = [owner for _, owner in points]
+
+    def copy(self):
+        ring = HashRing(replicas=self.replicas)
+        ring.nodes = list(self.nodes)
+        ring.__points = list(self.__points)
+        ring.__owners = list(self.__owners)
+        return ring
+
+    def node_for(self, key):
+        """Возвращает узел, которому принадлежит ключ"""
+        if not self.__points:
+            raise ValueError("В кольце нет ни одного узла")
+        index = bisect(self.__points, _hash(key)) % len(self.__points)
+        return self.__owners[index]
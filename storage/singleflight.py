@@ -0,0 +1,57 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом в одно вычисление.
+
+    Первый поток выполняет функцию, остальные ждут и получают тот же результат
+    (или то же исключение). Результат не кэшируется после завершения вызова.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self.__lock:
+            call = self.__calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self.__calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self.__lock:
+            return len(self.__calls)
@@ -0,0 +1,490 @@
+import itertools
+import os
+import threading
+from storage import codec
+from storage.sharding import HashRing
+from user.viewed import ViewedSet
+
+try:
+    import fcntl
+except ImportError:  # Windows: захват файлов не проверяется
+    fcntl = None
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def with_viewed_set(record):
+    """Запись с полем viewed в виде ViewedSet.
+
+    Множество строится один раз, когда запись попадает в память, и хранится
+    вместе с ней, а не пересобирается из списка на каждый запрос.
+    """
+    viewed = record.get('viewed')
+    if viewed is None or isinstance(viewed, ViewedSet):
+        return record
+    return {**record, 'viewed': ViewedSet(viewed)}
+
+
+def _read_records(path):
+    """Читает файл шарда через типизированный декодер пользователей"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return [{'id': id, 'name': name, 'like_categories': likes, 'dislike_categories': dislikes,
+             'viewed': ViewedSet(viewed)} for id, name, likes, dislikes, viewed in codec.decode_users(content)]
+
+
+def manifest_path(path):
+    """Манифест набора шардов лежит рядом с первым шардом: users.json -> users.shards.json"""
+    return os.path.splitext(path)[0] + '.shards.json'
+
+
+_versions = itertools.count(1)  # Общий счётчик версий записей для всех шардов
+
+
+class UserShard:
+    """Один файл с пользователями, закэшированный в памяти как id -> запись.
+
+    Под бюджетом памяти давно не использованные записи вытесняются (evict): от
+    них в памяти остаётся только смещение в файле шарда, а следующее обращение
+    читает запись из файла и возвращает её в память.
+    """
+
+    def __init__(self, path, reload_on_change=True):
+        self.path = path
+        self.reload_on_change = reload_on_change
+        self.lock = threading.RLock()
+        self.__records = None
+        self.__touched = set()  # Id записей, использованных в текущем периоде учёта (см. age)
+        self.__offsets = None  # id -> (смещение, длина) записи в файле; None, если файл записан не save()
+        self.__evicted = set()  # Id записей, которые есть только в файле
+        self.__signature = None
+        self.__versions = {}
+        self.__generation = 0
+        self.__dirty = False
+        self.__lock_file = None
+
+    def __ensure_loaded(self):
+        if self.__records is not None and not self.reload_on_change:
+            return
+        signature = _signature(self.path)
+        if self.__records is not None and signature == self.__signature:
+            return
+        records = _read_records(self.path) if signature is not None else []
+        self.__records = {record['id']: record for record in records}
+        self.__offsets = None
+        self.__evicted = set()
+        self.__touched = set()
+        self.__signature = signature
+        self.__versions = {}
+        self.__generation = next(_versions)
+
+    def load(self):
+        with self.lock:
+            self.__ensure_loaded()
+
+    def claim(self):
+        """Захватывает файл шарда для процесса; ValueError, если им уже владеет другой процесс"""
+        if fcntl is None or self.__lock_file is not None:
+            return
+        lock_file = open(f"{self.path}.lock", 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise ValueError(f"Шардом {self.path} владеет другой процесс")
+        self.__lock_file = lock_file
+
+    def release(self):
+        if self.__lock_file is not None:
+            self.__lock_file.close()
+            self.__lock_file = None
+
+    @property
+    def loaded(self):
+        return self.__records is not None
+
+    @property
+    def evicted_count(self):
+        return len(self.__evicted)
+
+    def cached_records(self):
+        """Записи в памяти без загрузки файла (None, если шард не загружен)"""
+        return self.__records
+
+    def evict(self, count):
+        """Вытесняет из памяти до count записей; возвращает их число.
+
+        Первыми вытесняются записи, не использованные с последнего вызова age()
+        (приближение LRU, как в алгоритме CLOCK). Несохранённые изменения сначала
+        пишутся в файл: вытесненная запись читается из него при следующем обращении.
+        """
+        with self.lock:
+            if self.__records is None or count <= 0:
+                return 0
+            if self.__dirty or self.__offsets is None:
+                self.save()
+            touched = self.__touched
+            victims = [user_id for user_id in self.__records if user_id not in touched][:count]
+            if len(victims) < count:
+                victims += [user_id for user_id in self.__records if user_id in touched][:count - len(victims)]
+            for user_id in victims:
+                del self.__records[user_id]
+            self.__evicted.update(victims)
+            self.__touched.difference_update(victims)
+            # Таблица словаря не сжимается при удалении: копия освобождает место вытесненных записей
+            self.__records = dict(self.__records)
+            return len(victims)
+
+    def age(self):
+        """Начинает новый период учёта обращений: все записи снова считаются неиспользованными"""
+        with self.lock:
+            self.__touched = set()
+
+    def __read_evicted(self, user_ids):
+        records = []
+        if not user_ids:
+            return records
+        with open(self.path, 'rb') as f:
+            for user_id in user_ids:
+                offset, length = self.__offsets[user_id]
+                f.seek(offset)
+                records.append(with_viewed_set(codec.loads(f.read(length))))
+        return records
+
+    def get(self, user_id):
+        with self.lock:
+            self.__ensure_loaded()
+            record = self.__records.get(user_id)
+            if record is None and user_id in self.__evicted:
+                record = self.__read_evicted([user_id])[0]
+                self.__evicted.discard(user_id)
+                self.__records[user_id] = record
+            if record is not None:
+                self.__touched.add(user_id)
+            return record
+
+    def all(self):
+        """Все записи шарда; вытесненные читаются из файла, но в память не возвращаются"""
+        with self.lock:
+            self.__ensure_loaded()
+            return list(self.__records.values()) + self.__read_evicted(self.__evicted)
+
+    def version(self, user_id):
+        """Версия записи: меняется при каждом изменении пользователя или перечитывании файла"""
+        with self.lock:
+            self.__ensure_loaded()
+            return self.__versions.get(user_id, self.__generation)
+
+    def ids(self):
+        with self.lock:
+            self.__ensure_loaded()
+            return list(self.__records) + list(self.__evicted)
+
+    def put(self, record, save=True):
+        """Добавляет или заменяет запись. Запись заменяется целиком, а не меняется на месте"""
+        with self.lock:
+            self.__ensure_loaded()
+            record = with_viewed_set(record)
+            self.__records[record['id']] = record
+            self.__touched.add(record['id'])
+            self.__evicted.discard(record['id'])
+            self.__versions[record['id']] = next(_versions)
+            if save:
+                self.save()
+            else:
+                self.__dirty = True
+
+    def remove(self, user_id, save=True):
+        with self.lock:
+            self.__ensure_loaded()
+            record = self.__records.pop(user_id, None)
+            if user_id in self.__evicted:
+                record = self.__read_evicted([user_id])[0]
+                self.__evicted.discard(user_id)
+            if save:
+                self.save()
+            else:
+                self.__dirty = True
+            return record
+
+    def __encoded_records(self):
+        """(id, JSON записи); вытесненные записи копируются из файла без декодирования"""
+        for user_id, record in self.__records.items():
+            yield user_id, codec.dumps(record)
+        if self.__evicted:
+            with open(self.path, 'rb') as f:
+                for user_id in self.__evicted:
+                    offset, length = self.__offsets[user_id]
+                    f.seek(offset)
+                    yield user_id, f.read(length)
+
+    def save(self):
+        """Атомарно перезаписывает файл шарда, запоминая смещение каждой записи"""
+        with self.lock:
+            if self.__records is None:
+                self.__ensure_loaded()
+            tmp_path = f"{self.path}.tmp"
+            offsets = {}
+            with open(tmp_path, 'wb') as f:
+                position = f.write(b'[')
+                for user_id, data in self.__encoded_records():
+                    if offsets:
+                        position += f.write(b',')
+                    offsets[user_id] = (position, len(data))
+                    position += f.write(data)
+                f.write(b']')
+            os.replace(tmp_path, self.path)
+            self.__offsets = offsets
+            self.__signature = _signature(self.path)
+            self.__dirty = False
+
+
+class UserStore:
+    """Пользователи, распределённые по файлам-шардам консистентным хешированием id.
+
+    Запись блокирует только свой шард, поэтому записи в разные шарды идут параллельно.
+    Шарды, добавленные через add_shard, записываются в манифест (manifest_path) и
+    подключаются при следующем запуске, даже если перечислены только исходные файлы.
+    Узел кольца — путь шарда относительно каталога манифеста.
+    """
+
+    def __init__(self, paths, reload_on_change=True, replicas=128):
+        paths = list(paths)
+        self.__manifest = manifest_path(os.path.abspath(paths[0]))
+        self.__base = os.path.dirname(self.__manifest)
+        self.__shards = {}
+        self.__ring = HashRing(replicas=replicas)
+        self.__migration = None  # (новый узел, старое кольцо, ещё не перенесённые узлы)
+        self.__rebalance_lock = threading.Lock()
+        self.__listeners = []
+        self.__claimed = False
+        for path in self.__read_manifest(paths):
+            shard = UserShard(path, reload_on_change)
+            self.__shards[self.__node(path)] = shard
+            self.__ring.add_node(self.__node(path))
+
+    @property
+    def reload_on_change(self):
+        return all(shard.reload_on_change for shard in self.__shards.values())
+
+    @reload_on_change.setter
+    def reload_on_change(self, value):
+        for shard in self.__shards.values():
+            shard.reload_on_change = value
+
+    def __node(self, path):
+        return os.path.relpath(os.path.abspath(path), self.__base)
+
+    def __read_manifest(self, paths):
+        """Полный список шардов: пути из манифеста в его порядке; ValueError, если путь не из манифеста.
+
+        Шард без манифеста поменял бы кольцо без переноса пользователей: новые
+        шарды подключаются только через add_shard.
+        """
+        if not os.path.exists(self.__manifest):
+            return paths
+        listed = [os.path.join(self.__base, name) for name in codec.read_file(self.__manifest)['shards']]
+        given = {self.__node(path): path for path in paths}
+        unknown = set(given) - {self.__node(path) for path in listed}
+        if unknown:
+            raise ValueError(f"Шарды {', '.join(sorted(unknown))} не перечислены в манифесте {self.__manifest}")
+        return [given.get(self.__node(path), path) for path in listed]
+
+    def __write_manifest(self):
+        tmp_path = f"{self.__manifest}.tmp"
+        codec.write_file(tmp_path, {'shards': list(self.__shards)})
+        os.replace(tmp_path, self.__manifest)
+
+    def shards(self):
+        return list(self.__shards.values())
+
+    def shard_for(self, user_id):
+        """Возвращает шард, в котором хранится пользователь"""
+        node = self.__ring.node_for(user_id)
+        migration = self.__migration
+        if migration is not None and node == migration[0]:
+            # Пока исходный шард не перенесён при ребалансировке, запись живёт в нём
+            old_node = migration[1].node_for(user_id)
+            if old_node in migration[2]:
+                return self.__shards[old_node]
+        return self.__shards[node]
+
+    def __locked_shard(self, user_id):
+        """Блокирует шард пользователя, перепроверяя маршрут после захвата блокировки"""
+        while True:
+            shard = self.shard_for(user_id)
+            shard.lock.acquire()
+            if self.shard_for(user_id) is shard:
+                return shard
+            shard.lock.release()
+
+    def claim(self):
+        """Захватывает все шарды для процесса, включая добавленные позже через add_shard.
+
+        Пока файлы захвачены, другой процесс (например, storage.rebalance) не может
+        их изменить. ValueError, если какой-то шард уже захвачен другим процессом.
+        """
+        with self.__rebalance_lock:
+            claimed = []
+            try:
+                for shard in self.__shards.values():
+                    shard.claim()
+                    claimed.append(shard)
+            except ValueError:
+                for shard in claimed:
+                    shard.release()
+                raise
+            self.__claimed = True
+
+    def release(self):
+        with self.__rebalance_lock:
+            for shard in self.__shards.values():
+                shard.release()
+            self.__claimed = False
+
+    def subscribe(self, callback):
+        """callback(запись, взаимодействие) вызывается после каждого изменения под блокировкой шарда.
+
+        Взаимодействие — (событие, id позиции), которое не видно по самой записи
+        (например, лайк позиции меняет только категории), или None.
+        """
+        self.__listeners.append(callback)
+
+    def __notify(self, record, interaction=None):
+        for callback in self.__listeners:
+            callback(record, interaction)
+
+    def load(self):
+        for shard in self.__shards.values():
+            shard.load()
+
+    def get(self, user_id):
+        return self.shard_for(user_id).get(user_id)
+
+    def version(self, user_id):
+        return self.shard_for(user_id).version(user_id)
+
+    def get_many(self, user_ids):
+        """Находит пользователей, обращаясь к каждому шарду один раз"""
+        by_shard = {}
+        for user_id in set(user_ids):
+            by_shard.setdefault(self.shard_for(user_id), []).append(user_id)
+        found = {}
+        for shard, ids in by_shard.items():
+            for user_id in ids:
+                record = shard.get(user_id)
+                if record is not None:
+                    found[user_id] = record
+        return found
+
+    def all(self):
+        records = []
+        for shard in self.__shards.values():
+            records.extend(shard.all())
+        return records
+
+    def ids(self):
+        ids = set()
+        for shard in self.__shards.values():
+            ids.update(shard.ids())
+        return ids
+
+    def put(self, record, interaction=None):
+        shard = self.__locked_shard(record['id'])
+        try:
+            shard.put(record)
+            self.__notify(record, interaction)
+        finally:
+            shard.lock.release()
+
+    def add(self, record):
+        """Добавляет нового пользователя; ValueError, если id уже занят"""
+        shard = self.__locked_shard(record['id'])
+        try:
+            if shard.get(record['id']) is not None:
+                raise ValueError("Пользователь уже существует")
+            shard.put(record)
+            self.__notify(record)
+        finally:
+            shard.lock.release()
+
+    def update(self, user_id, change, interaction=None):
+        """Атомарно заменяет запись на change(запись) под блокировкой шарда"""
+        shard = self.__locked_shard(user_id)
+        try:
+            record = shard.get(user_id)
+            if record is None:
+                raise ValueError(f"Пользователь с id {user_id} не найден")
+            new_record = change(record)
+            shard.put(new_record)
+            self.__notify(new_record, interaction)
+            return new_record
+        finally:
+            shard.lock.release()
+
+    def add_shard(self, path):
+        """Добавляет шард и переносит в него пользователей без остановки чтения и записи.
+
+        Шарды переносятся по одному; пока исходный шард не перенесён, запросы
+        к его пользователям продолжают направляться в него. Новый шард записывается
+        в манифест до переноса записей.
+        """
+        node = self.__node(path)
+        with self.__rebalance_lock:
+            if node in self.__shards:
+                raise ValueError(f"Шард {path} уже подключён")
+            new_shard = UserShard(path, self.reload_on_change)
+            if self.__claimed:
+                new_shard.claim()
+            old_shards = list(self.__shards.items())
+            new_ring = self.__ring.copy()
+            new_ring.add_node(node)
+            pending = {old_node for old_node, _ in old_shards}
+            self.__migration = (node, self.__ring, pending)
+            self.__shards[node] = new_shard
+            self.__ring = new_ring
+
+            moved = 0
+            with new_shard.lock:
+                new_shard.save()
+            self.__write_manifest()
+            for old_node, shard in old_shards:
+                with shard.lock, new_shard.lock:
+                    moving = [record for record in shard.all() if new_ring.node_for(record['id']) == node]
+                    for record in moving:
+                        new_shard.put(record, save=False)
+                    new_shard.save()
+                    for record in moving:
+                        shard.remove(record['id'], save=False)
+                    shard.save()
+                    pending.discard(old_node)
+                moved += len(moving)
+            self.__migration = None
+            return moved
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(paths, reload_on_change=None):
+    """Возвращает общий для процесса UserStore для набора файлов-шардов.
+
+    reload_on_change=False — процесс единолично владеет файлами и не перечитывает их
+    при внешних изменениях (режим сервера).
+    """
+    key = tuple(os.path.abspath(path) for path in paths)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = UserStore(key, True if reload_on_change is None else reload_on_change)
+            _stores[key] = store
+        elif reload_on_change is not None:
+            store.reload_on_change = reload_on_change
+        return store
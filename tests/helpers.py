@@ -0,0 +1,4 @@
+def make_user(user_id):
+    """Запись пользователя в формате users.json для тестов хранилищ"""
+    return {"id": user_id, "name": f"User {user_id}", "like_categories": [],
+            "dislike_categories": [], "viewed": []}
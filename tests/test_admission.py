@@ -0,0 +1,86 @@
+import unittest
+import http.client
+import threading
+from http.server import BaseHTTPRequestHandler
+from server.admission import BoundedHTTPServer, RouteLimiter
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def do_GET(self):
+        SlowHandler.started.release()
+        SlowHandler.release.wait(5)
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestBoundedHTTPServer(unittest.TestCase):
+
+    def setUp(self):
+        SlowHandler.release.clear()
+        self.server = BoundedHTTPServer(('localhost', 0), SlowHandler, workers=1, queue_size=1)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self):
+        SlowHandler.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def request(self, results):
+        connection = http.client.HTTPConnection('localhost', self.port, timeout=5)
+        connection.request('GET', '/')
+        response = connection.getresponse()
+        results.append((response.status, response.getheader('Retry-After'), response.read()))
+        connection.close()
+
+    def test_sheds_when_queue_full(self):
+        """Тестируем отказ 503 с Retry-After при заполненной очереди"""
+        results = []
+        first = threading.Thread(target=self.request, args=(results,))
+        first.start()
+        self.assertTrue(SlowHandler.started.acquire(timeout=5))
+        queued = threading.Thread(target=self.request, args=(results,))
+        queued.start()
+        while self.server.stats()['queue_depth'] < 1:
+            threading.Event().wait(0.01)
+
+        self.request(results)
+        self.assertEqual(results[0][:2], (503, '1'))
+        self.assertTrue(self.server.under_pressure())
+
+        SlowHandler.release.set()
+        first.join()
+        queued.join()
+        self.assertEqual(sorted(status for status, _, _ in results), [200, 200, 503])
+        stats = self.server.stats()
+        self.assertEqual(stats['shed_queue_full'], 1)
+        self.assertEqual(stats['accepted'], 2)
+
+
+class TestRouteLimiter(unittest.TestCase):
+
+    def test_limits(self):
+        """Тестируем ограничение одновременных запросов маршрута"""
+        limiter = RouteLimiter({'batch': 2})
+        self.assertTrue(limiter.acquire('batch'))
+        self.assertTrue(limiter.acquire('batch'))
+        self.assertFalse(limiter.acquire('batch'))
+        self.assertTrue(limiter.acquire(None))
+        limiter.release('batch')
+        self.assertTrue(limiter.acquire('batch'))
+        self.assertEqual(limiter.stats()['batch'], {'limit': 2, 'in_flight': 2, 'shed': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,12 +4,20 @@ import threading
 import time
 import json
 import os
+import socket
+import http.client
 from http.server import ThreadingHTTPServer
-from httpserver import UserHandler
+import httpserver
+from app.context import AppContext
+from server.admission import BoundedHTTPServer
+from tests.helpers import make_user
+from httpserver import UserHandler, app
 
 
 @pytest.fixture(scope='module')
 def http_server():
+    # Сервер читает данные при первом обращении; загружаем их до того, как backup_and_restore_data очистит файлы
+    app.warm_up()
     server = ThreadingHTTPServer(('localhost', 0), UserHandler)
     port = server.server_address[1]
     thread = threading.Thread(target=server.serve_forever)
@@ -36,7 +44,7 @@ def test_user(http_server):
 
 
 @pytest.fixture(scope='module', autouse=True)
-def backup_and_restore_data():
+def backup_and_restore_data(http_server):
     users_file = './users.json'
     positions_file = '../positions.json'
 
@@ -74,6 +82,20 @@ def backup_and_restore_data():
         print(f"Исходные данные позиций восстановлены: {len(original_positions)} позиций")
 
 
+@pytest.fixture
+def handled_connections(monkeypatch):
+    """(порт клиента, номер запроса на соединении) для каждого запроса, как их видит обработчик"""
+    handled = []
+    start_request = UserHandler._start_request
+
+    def record(handler):
+        start_request(handler)
+        handled.append((handler.client_address[1], handler.requests_served))
+
+    monkeypatch.setattr(UserHandler, '_start_request', record)
+    return handled
+
+
 # Позитивные тесты (ожидаемый результат совпадает с фактическим)
 def test_create_user_success(http_server, test_user):
     new_user = test_user
@@ -151,6 +173,16 @@ def test_create_user_invalid_json_failure(http_server):
     assert 'error' in data, "Ожидалась ошибка в ответе для некорректного JSON"
 
 
+@pytest.mark.parametrize('field, value', [('viewed', ['abc']), ('viewed', 5), ('like_categories', [1])])
+def test_create_user_invalid_field_types(http_server, field, value):
+    new_user = {"id": 1005, "name": "Test User 1005", "like_categories": [], "dislike_categories": [],
+                "viewed": []}
+    new_user[field] = value
+    resp = requests.post(f'{http_server}/users', json=new_user)
+    assert resp.status_code == 400
+    assert requests.get(f'{http_server}/users/1005').status_code == 404
+
+
 def test_get_user_not_found_failure(http_server):
     resp_not_found = requests.get(f'{http_server}/users/99999')
     print(resp_not_found.json())
@@ -270,4 +302,195 @@ def test_like_movie_twice(http_server):
     assert first_resp.status_code == 200, f"Первый лайк должен быть успешным, получен {first_resp.status_code}"
     second_resp = requests.post(f'{http_server}/users/{user_id}/movie/{movie_id}/like')
     assert second_resp.status_code in [200,
-                                       409], f"Ожидался 409 или 200 при повторном лайке, получен {second_resp.status_code}"
\ No newline at end of file
+                                       409], f"Ожидался 409 или 200 при повторном лайке, получен {second_resp.status_code}"
+
+
+def test_batch_get_users(http_server, test_user):
+    new_id = test_user['id']
+    resp = requests.post(f'{http_server}/users:batchGet', json={'ids': [new_id, 99999]})
+    assert resp.status_code == 200, f"Ожидался статус 200, получен {resp.status_code}"
+    data = resp.json()
+    assert [item['id'] for item in data] == [new_id, 99999], "Порядок ответа должен совпадать с запросом"
+    assert data[0]['name'] == test_user['name']
+    assert data[1]['error'] == 'Пользователь не найден'
+
+
+def test_batch_recommendations(http_server, test_user):
+    new_id = test_user['id']
+    resp = requests.post(f'{http_server}/recommendations:batch', json={'user_ids': [new_id, 99999, new_id]})
+    assert resp.status_code == 200, f"Ожидался статус 200, получен {resp.status_code}"
+    data = resp.json()
+    assert [item['user_id'] for item in data] == [new_id, 99999, new_id]
+    single = requests.get(f'{http_server}/users/{new_id}/recommendations').json()
+    assert data[0]['recommendations'] == single
+    assert data[2]['recommendations'] == single
+    assert data[1]['error'] == 'Пользователь не найден'
+
+
+def test_batch_recommendations_ndjson_streams_fragments(http_server, test_user):
+    new_id = test_user['id']
+    resp = requests.post(f'{http_server}/recommendations:batch?format=ndjson', json={'user_ids': [new_id, 99999]})
+    lines = [json.loads(line) for line in resp.iter_lines() if line]
+    assert [line['user_id'] for line in lines] == [new_id, 99999]
+    catalog = app.catalog_manager.current()
+    pieces = list(httpserver.iter_batch_item(new_id, app.user_store.get(new_id), catalog))
+    # Элемент отдаётся по одной позиции, без копии всего массива рекомендаций
+    assert max(len(piece) for piece in pieces) <= max(len(fragment) for fragment in catalog.fragments.values())
+    assert json.loads(b''.join(pieces))['recommendations'] == lines[0]['recommendations']
+
+
+def test_batch_invalid_body(http_server):
+    resp = requests.post(f'{http_server}/users:batchGet', json={'ids': ['abc']})
+    assert resp.status_code == 400, f"Ожидался статус 400, получен {resp.status_code}"
+    assert 'error' in resp.json()
+
+
+def test_get_recommendations_chunked(http_server, test_user):
+    new_id = test_user['id']
+    resp = requests.get(f'{http_server}/users/{new_id}/recommendations')
+    assert resp.headers.get('Transfer-Encoding') == 'chunked', "Ожидалась потоковая отдача чанками"
+    assert 'Content-Length' not in resp.headers
+
+
+def test_get_recommendations_ndjson(http_server, test_user):
+    new_id = test_user['id']
+    resp = requests.get(f'{http_server}/users/{new_id}/recommendations?format=ndjson')
+    assert resp.status_code == 200, f"Ожидался статус 200, получен {resp.status_code}"
+    assert resp.headers['Content-Type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in resp.iter_lines() if line]
+    assert lines == requests.get(f'{http_server}/users/{new_id}/recommendations').json()
+
+
+def test_metrics(http_server):
+    resp = requests.get(f'{http_server}/metrics')
+    assert resp.status_code == 200, f"Ожидался статус 200, получен {resp.status_code}"
+    data = resp.json()
+    assert set(data['routes']) == {'recommendations', 'batch', 'write'}
+    assert 'shared' in data['recommendations_flight']
+
+
+def test_get_popular(http_server):
+    resp = requests.get(f'{http_server}/popular?window=trending')
+    assert resp.status_code == 200
+    assert isinstance(resp.json(), list)
+    resp_bad = requests.get(f'{http_server}/popular?window=yearly')
+    assert resp_bad.status_code == 400
+
+
+def test_keepalive_reuses_connection(http_server, test_user, handled_connections):
+    with requests.Session() as session:
+        for path in [f'/users/{test_user["id"]}'] * 3 + [f'/users/{test_user["id"]}/recommendations']:
+            resp = session.get(f'{http_server}{path}')
+            assert resp.status_code == 200
+            assert 'timeout=' in resp.headers['Keep-Alive']
+    assert len({port for port, _ in handled_connections}) == 1
+    assert [served for _, served in handled_connections] == [1, 2, 3, 4]
+
+
+def test_keepalive_request_cap(http_server, test_user, monkeypatch, handled_connections):
+    monkeypatch.setattr(UserHandler, 'max_keepalive_requests', 2)
+    with requests.Session() as session:
+        responses = [session.get(f'{http_server}/users/{test_user["id"]}') for _ in range(4)]
+    assert [resp.status_code for resp in responses] == [200] * 4
+    assert [resp.headers.get('Connection') for resp in responses] == [None, 'close', None, 'close']
+    # Сессия открывает новое соединение только после того, как сервер закрыл предыдущее
+    assert [served for _, served in handled_connections] == [1, 2, 1, 2]
+    ports = [port for port, _ in handled_connections]
+    assert ports[0] == ports[1] != ports[2] == ports[3]
+
+
+def test_keepalive_pipelining_and_idle_timeout(http_server, test_user, monkeypatch):
+    monkeypatch.setattr(UserHandler, 'timeout', 0.3)
+    host, port = http_server.rsplit('/', 1)[1].split(':')
+    with socket.create_connection((host, int(port)), timeout=5) as sock:
+        request = f'GET /users/{test_user["id"]} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode()
+        sock.sendall(request * 2)
+        received = b''
+        while received.count(b'HTTP/1.1 200') < 2 or not received.endswith(b'}'):
+            chunk = sock.recv(65536)
+            assert chunk, "Соединение закрыто до второго ответа"
+            received += chunk
+        # После простоя дольше timeout сервер закрывает соединение
+        assert sock.recv(65536) == b''
+
+
+def test_keepalive_idle_connections_release_workers(test_user):
+    server = BoundedHTTPServer(('localhost', 0), UserHandler, workers=2, queue_size=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    idle = []
+    try:
+        for _ in range(2):
+            connection = http.client.HTTPConnection('localhost', port, timeout=5)
+            connection.request('GET', '/metrics')
+            assert connection.getresponse().read()
+            idle.append(connection)
+        # Оба потока пула заняты простаивающими соединениями; новый клиент не должен ждать их timeout
+        started = time.monotonic()
+        connection = http.client.HTTPConnection('localhost', port, timeout=5)
+        connection.request('GET', '/metrics')
+        resp = connection.getresponse()
+        resp.read()
+        connection.close()
+        assert resp.status == 200
+        assert time.monotonic() - started < 1.0
+    finally:
+        for connection in idle:
+            connection.close()
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@pytest.mark.parametrize('length', ['abc', '-5'])
+def test_invalid_content_length(http_server, length):
+    host, port = http_server.rsplit('/', 1)[1].split(':')
+    with socket.create_connection((host, int(port)), timeout=5) as sock:
+        sock.sendall(f'POST /users HTTP/1.1\r\nHost: {host}\r\nContent-Length: {length}\r\n\r\n'.encode())
+        received = b''
+        while chunk := sock.recv(65536):
+            received += chunk
+    head = received.split(b'\r\n\r\n', 1)[0].decode()
+    assert head.startswith('HTTP/1.1 400')
+    assert 'Connection: close' in head
+
+
+def test_admin_add_user_shard(http_server, tmp_path, monkeypatch):
+    paths = [str(tmp_path / 'users-0.json')]
+    context = AppContext(paths, httpserver.POSITIONS_FILE)
+    for user_id in range(1, 101):
+        context.user_store.add(make_user(user_id))
+    monkeypatch.setattr(httpserver, 'app', context)
+    new_path = str(tmp_path / 'users-1.json')
+    resp = requests.post(f'{http_server}/admin/shards', json={'path': new_path})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data['moved'] > 0
+    assert data['shards'] == paths + [new_path]
+    assert requests.get(f'{http_server}/users/42').json()['name'] == 'User 42'
+    resp_again = requests.post(f'{http_server}/admin/shards', json={'path': new_path})
+    assert resp_again.status_code == 400
+
+
+def test_get_recommendations_diversified(http_server, test_user):
+    new_id = test_user['id']
+    resp = requests.get(f'{http_server}/users/{new_id}/recommendations?diversity=0.8&limit=10&pool=100')
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data) == 10
+    full = requests.get(f'{http_server}/users/{new_id}/recommendations').json()
+    assert {p['id'] for p in data} <= {p['id'] for p in full[:100]}
+    resp_bad = requests.get(f'{http_server}/users/{new_id}/recommendations?diversity=5')
+    assert resp_bad.status_code == 400
+
+
+def test_debug_memory(http_server, monkeypatch):
+    resp_disabled = requests.get(f'{http_server}/debug/memory')
+    assert resp_disabled.status_code == 404
+    monkeypatch.setattr(httpserver, 'memory_monitor', httpserver.create_memory_monitor())
+    resp = requests.get(f'{http_server}/debug/memory')
+    assert resp.status_code == 200
+    data = resp.json()
+    assert {'catalog', 'caches', 'users'} <= set(data['sections'])
+    assert data['sections']['catalog']['total'] > 0
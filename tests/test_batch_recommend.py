@@ -0,0 +1,72 @@
+import unittest
+import os
+import tempfile
+from items.catalog import Catalog
+from items.position import Position
+from jobs import batch_recommend
+from storage import codec
+
+
+class TestBatchRecommend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.positions_path = os.path.join(self.tmp.name, 'positions.json')
+        self.users_path = os.path.join(self.tmp.name, 'users.json')
+        self.out_dir = os.path.join(self.tmp.name, 'out')
+        positions = [
+            {"id": 1, "position_name": "A", "tag": ["Action"]},
+            {"id": 2, "position_name": "B", "tag": ["Comedy"]},
+            {"id": 3, "position_name": "C", "tag": ["Action"]},
+            {"id": 4, "position_name": "D", "tag": ["Horror", "Action"]},
+        ]
+        self.users = [
+            {"id": user_id, "name": f"User {user_id}", "like_categories": ["Action"],
+             "dislike_categories": ["Horror"], "viewed": [user_id % 3 + 1]}
+            for user_id in range(1, 21)
+        ]
+        codec.write_file(self.positions_path, positions)
+        codec.write_file(self.users_path, self.users)
+
+    def read_results(self):
+        results = {}
+        for name in os.listdir(self.out_dir):
+            if name.endswith('.jsonl'):
+                with open(os.path.join(self.out_dir, name), 'rb') as f:
+                    for line in f:
+                        row = codec.loads(line)
+                        results[row['user_id']] = row['recommendations']
+        return results
+
+    def test_results_for_every_user(self):
+        """Тестируем, что результат совпадает с правилом рекомендаций для каждого пользователя"""
+        stats = batch_recommend.run([self.users_path], self.positions_path, self.out_dir,
+                                    workers=2, partitions=4)
+        self.assertEqual(stats['users'], 20)
+        catalog = Catalog(Position.read_file(self.positions_path))
+        expected = {user['id']: Position.recommend_ids(user, catalog) for user in self.users}
+        self.assertEqual(self.read_results(), expected)
+        self.assertEqual(expected[1], [1, 3])
+
+    def test_resume_skips_finished_partitions(self):
+        """Тестируем, что повторный запуск пропускает партиции из чекпоинта"""
+        batch_recommend.run([self.users_path], self.positions_path, self.out_dir, workers=1, partitions=4)
+        os.remove(batch_recommend.partition_path(self.out_dir, 2))
+        progress = []
+        stats = batch_recommend.run([self.users_path], self.positions_path, self.out_dir, workers=1,
+                                    partitions=4, progress=lambda *args: progress.append(args))
+        self.assertEqual(stats['skipped'], 3)
+        self.assertEqual(stats['users'], 5)
+        self.assertEqual(progress[-1][:4], (4, 4, 5, 5))
+        self.assertEqual(len(self.read_results()), 20)
+
+    def test_checkpoint_for_other_partitioning(self):
+        """Тестируем ошибку при продолжении с другим числом партиций"""
+        batch_recommend.run([self.users_path], self.positions_path, self.out_dir, workers=1, partitions=4)
+        with self.assertRaises(ValueError):
+            batch_recommend.run([self.users_path], self.positions_path, self.out_dir, workers=1, partitions=8)
+
+
+if __name__ == '__main__':
+    unittest.main()
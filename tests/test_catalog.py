@@ -0,0 +1,91 @@
+import unittest
+import json
+import os
+import threading
+import time
+from items.catalog import CatalogManager
+from items.position import Position
+
+
+class TestCatalogManager(unittest.TestCase):
+    TEST_POSITION_FILE_PATH = "./test_catalog_positions.json"
+
+    def write_positions(self, positions):
+        with open(self.TEST_POSITION_FILE_PATH, "w", encoding="utf-8") as f:
+            json.dump(positions, f, indent=4, ensure_ascii=False)
+
+    def setUp(self):
+        self.write_positions([
+            {"id": 1, "position_name": "Gin", "tag": ["sports"]},
+            {"id": 2, "position_name": "Shrimp", "tag": ["music", "sports"]}
+        ])
+        self.manager = CatalogManager(self.TEST_POSITION_FILE_PATH, Position.read_file, poll_interval=0.05)
+
+    def tearDown(self):
+        self.manager.stop()
+        if os.path.exists(self.TEST_POSITION_FILE_PATH):
+            os.remove(self.TEST_POSITION_FILE_PATH)
+
+    def test_snapshot_indexes(self):
+        """Тестируем индексы снимка каталога"""
+        catalog = self.manager.current()
+        self.assertEqual(len(catalog), 2)
+        self.assertEqual(catalog.ids, (1, 2))
+        self.assertEqual(catalog.postings["sports"], (1, 2))
+        self.assertEqual(catalog.tags, frozenset({"sports", "music"}))
+        self.assertEqual(catalog.by_id[2]["position_name"], "Shrimp")
+        self.assertEqual(catalog.index.get_tags(1), ["sports"])
+
+    def test_reload_is_copy_on_write(self):
+        """Тестируем, что старый снимок не меняется после перезагрузки"""
+        old = self.manager.current()
+        self.assertFalse(self.manager.reload())
+
+        self.write_positions([{"id": 3, "position_name": "Tea", "tag": ["travel"]}])
+        self.assertTrue(self.manager.reload(force=True))
+        new = self.manager.current()
+
+        self.assertEqual(new.version, old.version + 1)
+        self.assertEqual(new.ids, (3,))
+        self.assertIsNone(new.index.get(1))
+        self.assertEqual(old.ids, (1, 2))
+        self.assertEqual(old.index.get_tags(1), ["sports"])
+        self.assertIsNone(old.index.get(3))
+
+    def test_readers_do_not_wait_for_rebuild(self):
+        """Тестируем, что во время перестройки снимка читатели получают прежний снимок"""
+        entered, release = threading.Event(), threading.Event()
+
+        def slow_loader(path):
+            entered.set()
+            release.wait(5)
+            return Position.read_file(path)
+
+        manager = CatalogManager(self.TEST_POSITION_FILE_PATH, slow_loader)
+        release.set()
+        self.assertEqual(manager.current().ids, (1, 2))
+        entered.clear()
+        release.clear()
+        self.write_positions([{"id": 3, "position_name": "Tea", "tag": ["travel"]}])
+        rebuild = threading.Thread(target=manager.reload)
+        rebuild.start()
+        self.assertTrue(entered.wait(5))
+        self.assertEqual(manager.current().ids, (1, 2))
+        release.set()
+        rebuild.join()
+        self.assertEqual(manager.current().ids, (3,))
+
+    def test_background_watcher(self):
+        """Тестируем подмену снимка фоновым потоком"""
+        self.manager.start()
+        version = self.manager.current().version
+        self.write_positions([{"id": 5, "position_name": "Tea", "tag": ["travel"]}])
+
+        deadline = time.time() + 2
+        while self.manager.current().version == version and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.manager.current().ids, (5,))
+
+
+if __name__ == "__main__":
+    unittest.main()
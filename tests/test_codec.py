@@ -0,0 +1,48 @@
+import unittest
+from storage import codec
+from user.viewed import ViewedSet
+
+
+class TestCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = codec.BACKEND
+
+    def tearDown(self):
+        codec.use_backend(self.backend)
+
+    def test_compact_roundtrip(self):
+        """Тестируем компактную сериализацию для всех доступных кодеков"""
+        data = [{"id": 1, "name": "Алиса", "viewed": ViewedSet([3, 1])}]
+        for backend in ('json', 'orjson', 'msgspec'):
+            try:
+                codec.use_backend(backend)
+            except ValueError:
+                continue
+            encoded = codec.dumps(data)
+            self.assertIsInstance(encoded, bytes)
+            self.assertNotIn(b' ', encoded)
+            self.assertNotIn(b'\n', encoded)
+            self.assertEqual(codec.loads(encoded), [{"id": 1, "name": "Алиса", "viewed": [3, 1]}])
+
+    def test_decode_records(self):
+        """Тестируем декодирование позиций и пользователей в кортежи для всех доступных кодеков"""
+        positions = b'[{"id": 1, "position_name": "Gin", "tag": ["sports"]}]'
+        users = b'[{"id": 2, "name": "Bob", "like_categories": [], "dislike_categories": ["music"], "viewed": [5]}]'
+        for backend in ('json', 'orjson', 'msgspec'):
+            try:
+                codec.use_backend(backend)
+            except ValueError:
+                continue
+            self.assertEqual(codec.decode_positions(positions), [(1, "Gin", ["sports"])])
+            self.assertEqual(codec.decode_users(users), [(2, "Bob", [], ["music"], [5])])
+            self.assertEqual(codec.decode_positions(b''), [])
+
+    def test_unknown_backend(self):
+        """Тестируем ошибку при выборе недоступного кодека"""
+        with self.assertRaises(ValueError):
+            codec.use_backend('pickle')
+
+
+if __name__ == "__main__":
+    unittest.main()
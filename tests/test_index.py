@@ -0,0 +1,31 @@
+import unittest
+from items.index import PositionIndex
+from items.position import Position
+
+
+class TestPositionIndex(unittest.TestCase):
+
+    def test_get_and_tags(self):
+        """Тестируем поиск позиции и её тегов"""
+        index = PositionIndex([Position(1, "A", ["sports"]), Position(2, "B", ["music"])])
+        self.assertEqual(index.get(1).get_name(), "A")
+        self.assertEqual(index.get_tags(2), ["music"])
+        self.assertIsNone(index.get(3))
+        self.assertIsNone(index.get_tags("str"))
+        self.assertIn(1, index)
+        self.assertNotIn(3, index)
+
+    def test_update(self):
+        """Тестируем обновление при добавлении и удалении позиций"""
+        index = PositionIndex([Position(1, "A", ["sports"])])
+        index.update([Position(1, "A", ["sports"]), Position(2, "B", ["music"])])
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.get_tags(2), ["music"])
+
+        index.update([Position(2, "B", ["music"])])
+        self.assertIsNone(index.get(1))
+        self.assertEqual(len(index), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
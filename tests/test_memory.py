@@ -0,0 +1,100 @@
+import unittest
+import os
+import sys
+import tempfile
+import tracemalloc
+from app.memory import MemoryMonitor, deep_sizeof
+from storage import codec
+from storage.user_store import UserStore
+from tests.helpers import make_user
+
+
+class TestDeepSizeof(unittest.TestCase):
+
+    def test_counts_nested_objects(self):
+        """Тестируем, что учитываются вложенные объекты"""
+        record = {'name': 'x' * 1000, 'tags': ['a', 'b']}
+        self.assertGreater(deep_sizeof(record), sys.getsizeof(record) + 1000)
+
+    def test_shared_objects_counted_once(self):
+        """Тестируем, что общий seen не даёт посчитать разделяемые объекты дважды"""
+        payload = ['x' * 1000]
+        seen = set()
+        first = deep_sizeof({'a': payload}, seen)
+        second = deep_sizeof({'b': payload}, seen)
+        self.assertLess(second, first - 1000)
+
+
+class TestMemoryMonitor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.paths = [os.path.join(self.tmp.name, f'users_{i}.json') for i in range(3)]
+        for path in self.paths:
+            codec.write_file(path, [])
+        self.store = UserStore(self.paths, reload_on_change=False)
+        for user_id in range(1, 301):
+            self.store.add(make_user(user_id))
+        self.cache = {'hot': list(range(100))}
+        self.monitor = MemoryMonitor({'caches': lambda: {'cache': self.cache}}, lambda: self.store,
+                                     budget=None)
+
+    def test_report_per_structure(self):
+        """Тестируем отчёт по разделам и шардам"""
+        report = self.monitor.report()
+        self.assertGreater(report['sections']['caches']['parts']['cache'], 0)
+        shards = report['sections']['users']['parts']
+        self.assertEqual(set(shards), set(self.paths))
+        self.assertTrue(all(size > 0 for size in shards.values()))
+        self.assertEqual(report['total'], sum(section['total'] for section in report['sections'].values()))
+        self.assertFalse(report['over_budget'])
+
+    def test_budget_evicts_least_recently_used_profiles(self):
+        """Тестируем, что при превышении бюджета вытесняются давно не использованные профили, а данные остаются доступны"""
+        self.monitor.enforce()  # Без бюджета только начинает новый период учёта обращений
+        self.monitor.budget = self.monitor.measure()['total'] * 3 // 4
+        self.store.get(1)  # Использованный профиль вытесняется последним
+        evicted = self.monitor.enforce()
+        self.assertGreater(evicted, 0)
+        self.assertLess(evicted, 300)
+        self.assertIn(1, self.store.shard_for(1).cached_records())
+        self.assertLessEqual(self.monitor.measure()['total'], self.monitor.budget)
+        self.assertEqual(self.monitor.report()['profiles_on_disk'], evicted)
+        self.assertEqual(len(self.store.ids()), 300)
+        self.assertEqual(len(self.store.all()), 300)
+        for user_id in range(1, 301):
+            self.assertEqual(self.store.get(user_id), make_user(user_id))
+
+    def test_single_shard_evicts_within_shard(self):
+        """Тестируем вытеснение части профилей, когда все пользователи в одном шарде"""
+        store = UserStore([os.path.join(self.tmp.name, 'single.json')], reload_on_change=False)
+        for user_id in range(1, 101):
+            store.add(make_user(user_id))
+        monitor = MemoryMonitor({}, lambda: store)
+        monitor.budget = monitor.measure()['total'] // 2
+        evicted = monitor.enforce()
+        self.assertTrue(0 < evicted < 100)
+        self.assertEqual(UserStore([store.shards()[0].path]).get(1), make_user(1))
+
+    def test_evict_writes_back_unsaved_changes(self):
+        """Тестируем, что вытеснение сохраняет несохранённые изменения"""
+        shard = self.store.shard_for(5)
+        changed = dict(make_user(5), name="Changed")
+        shard.put(changed, save=False)
+        shard.get(5)
+        self.assertEqual(shard.evict(len(shard.cached_records())), len(shard.ids()))
+        self.assertEqual(shard.cached_records(), {})
+        self.assertEqual(self.store.get(5), changed)
+        self.assertEqual(UserStore([shard.path]).get(5), changed)
+
+    def test_tracemalloc_section(self):
+        """Тестируем данные tracemalloc в режиме профилирования"""
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        report = self.monitor.report()
+        self.assertGreaterEqual(report['tracemalloc']['peak'], report['tracemalloc']['current'])
+
+
+if __name__ == '__main__':
+    unittest.main()
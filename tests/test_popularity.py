@@ -0,0 +1,95 @@
+import time
+import unittest
+from items.popularity import Popularity
+
+
+class FakeCatalog:
+    def __init__(self, positions):
+        self.by_id = {p['id']: p for p in positions}
+
+
+class TestPopularity(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = FakeCatalog([
+            {'id': 1, 'position_name': 'A', 'tag': ['Action']},
+            {'id': 2, 'position_name': 'B', 'tag': ['Comedy']},
+            {'id': 3, 'position_name': 'C', 'tag': ['Action', 'Comedy']},
+        ])
+        self.popularity = Popularity(lambda: self.catalog,
+                                     windows={'trending': 10.0, 'popular': 1000.0}, top_n=2)
+
+    def test_top_ordered_by_weighted_events(self):
+        """Тестируем, что лайк весит больше просмотра"""
+        self.popularity.record(1, 'viewed', timestamp=0)
+        self.popularity.record(1, 'viewed', timestamp=0)
+        self.popularity.record(2, 'like', timestamp=0)
+        self.popularity.refresh(now=0)
+        self.assertEqual(self.popularity.top(), (2, 1))
+
+    def test_trending_decays_faster(self):
+        """Тестируем, что старые события быстрее теряют вес в коротком окне"""
+        for _ in range(3):
+            self.popularity.record(1, 'viewed', timestamp=0)
+        self.popularity.record(2, 'viewed', timestamp=100)
+        self.popularity.refresh(now=100)
+        self.assertEqual(self.popularity.top('trending'), (2, 1))
+        self.assertEqual(self.popularity.top('popular'), (1, 2))
+
+    def test_top_by_tag_and_limit(self):
+        """Тестируем списки по тегам и ограничение top_n"""
+        self.popularity.record(3, 'like', timestamp=0)
+        self.popularity.record(1, 'viewed', timestamp=0)
+        self.popularity.record(2, 'viewed', timestamp=0)
+        self.popularity.refresh(now=0)
+        self.assertEqual(len(self.popularity.top()), 2)
+        self.assertEqual(self.popularity.top(tag='Action'), (3, 1))
+        self.assertEqual(self.popularity.top(tag='Comedy'), (3, 2))
+        self.assertEqual(self.popularity.top(tag='Horror'), ())
+
+    def test_top_updated_only_on_refresh(self):
+        """Тестируем, что чтение не пересчитывает списки"""
+        self.popularity.record(1, 'viewed', timestamp=0)
+        self.assertEqual(self.popularity.top(), ())
+        self.popularity.refresh(now=0)
+        self.assertEqual(self.popularity.top(), (1,))
+
+    def test_seed_skips_positions_missing_from_catalog(self):
+        """Тестируем наполнение по истории просмотров без удалённых позиций"""
+        self.popularity.seed([{'id': 1, 'viewed': [1, 99]}, {'id': 2, 'viewed': [1]}], timestamp=0)
+        self.popularity.refresh(now=0)
+        self.assertEqual(self.popularity.top(), (1,))
+
+
+    def test_observe_counts_new_views_and_interactions(self):
+        """Тестируем учёт изменений хранилища: только новые просмотры и переданный лайк"""
+        self.popularity.observe({'id': 1, 'viewed': [1]}, timestamp=0)
+        self.popularity.observe({'id': 1, 'viewed': [1, 2]}, timestamp=0)
+        self.popularity.observe({'id': 1, 'viewed': [1, 2]}, timestamp=0)
+        self.popularity.observe({'id': 2, 'viewed': []}, ('like', 3), timestamp=0)
+        self.popularity.refresh(now=0)
+        self.assertEqual(self.popularity.top(), (3, 1))
+        self.assertEqual(self.popularity.top(tag='Comedy'), (3, 2))
+
+    def test_refresh_error_keeps_thread_running(self):
+        """Тестируем, что ошибка пересчёта не останавливает фоновый поток"""
+        calls = []
+
+        def catalog():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OSError("каталог недоступен")
+            return self.catalog
+
+        popularity = Popularity(catalog, interval=0.01)
+        popularity.record(1, 'viewed')
+        popularity.start()
+        self.addCleanup(popularity.stop)
+        deadline = time.time() + 5
+        while not popularity.top() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(popularity.top(), (1,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -51,6 +51,7 @@ class TestPosition(unittest.TestCase):
         # Переопределяем пути к файлам
         Position.FILE_PATH = self.TEST_POSITION_FILE_PATH  # Динамический путь для позиций
         User.FILE_PATH = self.TEST_USER_FILE_PATH  # Динамический путь для пользователей
+        Position.USERS_FILE_PATH = self.TEST_USER_FILE_PATH
 
     def tearDown(self):
         """Этот метод выполняется после каждого теста."""
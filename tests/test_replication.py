@@ -0,0 +1,97 @@
+import unittest
+import os
+import tempfile
+import time
+from items.popularity import Popularity
+from storage.replication import InteractionLog, Replica, ReplicationServer
+from storage.user_store import UserStore
+from tests.helpers import make_user
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestReplication(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = UserStore([os.path.join(self.tmp.name, "users.json")])
+        self.store.add(make_user(1))
+        self.log = InteractionLog(self.store)
+        self.server = ReplicationServer(self.log, "127.0.0.1:0")
+        self.server.start()
+        host, port = self.server.address
+        self.replica = Replica(f"{host}:{port}", reconnect_interval=0.05)
+
+    def tearDown(self):
+        self.replica.stop()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_snapshot_and_stream(self):
+        """Тестируем начальный снимок и применение последующих изменений"""
+        self.replica.start()
+        self.assertTrue(self.replica.synced.wait(5))
+        self.assertEqual(self.replica.store.get(1)["name"], "User 1")
+
+        self.store.add(make_user(2))
+        self.store.update(1, lambda record: {**record, "viewed": [7]})
+        self.assertTrue(wait_for(lambda: self.replica.applied_seq == self.log.seq))
+        self.assertEqual(self.replica.store.get(1)["viewed"], [7])
+        self.assertIsNotNone(self.replica.store.get(2))
+
+        lag = self.replica.lag()
+        self.assertTrue(lag["connected"])
+        self.assertEqual(lag["seq_lag"], 0)
+        self.assertLess(lag["lag_seconds"], 5)
+
+    def test_catch_up_from_log(self):
+        """Тестируем, что журнал без снимка отдаёт только пропущенные события"""
+        self.store.add(make_user(2))
+        self.store.add(make_user(3))
+        events = self.log.subscribe(lambda event: None, since=1, log_id=self.log.log_id)
+        self.assertEqual([event["user"]["id"] for event in events], [3])
+        snapshot = self.log.subscribe(lambda event: None)
+        self.assertEqual(snapshot[0]["op"], "snapshot")
+        self.assertEqual(len(snapshot[0]["users"]), 3)
+        other_log = self.log.subscribe(lambda event: None, since=1, log_id="restarted")
+        self.assertEqual(other_log[0]["op"], "snapshot")
+
+    def test_primary_restart(self):
+        """Тестируем, что снимок перезапущенного первичного сервера сбрасывает номер журнала"""
+        self.replica.apply({"op": "snapshot", "seq": 5, "ts": time.time(), "log": "a", "users": [make_user(1)]})
+        self.replica.apply({"op": "upsert", "seq": 6, "ts": time.time(), "user": make_user(2)})
+        self.replica.apply({"op": "snapshot", "seq": 2, "ts": time.time(), "log": "b", "users": [make_user(3)]})
+        lag = self.replica.lag()
+        self.assertEqual((lag["applied_seq"], lag["primary_seq"], lag["seq_lag"]), (2, 2, 0))
+        self.assertTrue(self.replica.synced.is_set())
+        self.assertEqual(self.replica.store.ids(), {3})
+
+    def test_replica_feeds_popularity(self):
+        """Тестируем, что популярность реплики наполняется снимком и событиями журнала"""
+        catalog = type('Catalog', (), {'by_id': {7: {'id': 7, 'tag': []}, 8: {'id': 8, 'tag': []}}})()
+        popularity = Popularity(lambda: catalog)
+        self.replica.store.subscribe(popularity.observe)
+        self.store.update(1, lambda record: {**record, "viewed": [7]})
+        self.replica.start()
+        self.assertTrue(self.replica.synced.wait(5))
+
+        self.store.update(1, lambda record: {**record, "viewed": [7, 8]}, interaction=('like', 8))
+        self.assertTrue(wait_for(lambda: self.replica.applied_seq == self.log.seq))
+        popularity.refresh()
+        self.assertEqual(popularity.top(), (8, 7))
+
+    def test_disconnect_clears_synced(self):
+        """Тестируем, что после обрыва соединения реплика не считается синхронизированной"""
+        self.replica.start()
+        self.assertTrue(self.replica.synced.wait(5))
+        self.server.stop()
+        self.assertTrue(wait_for(lambda: not self.replica.synced.is_set()))
+
+
+if __name__ == "__main__":
+    unittest.main()
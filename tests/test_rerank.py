@@ -0,0 +1,48 @@
+import unittest
+from items import rerank
+from items.position import Position
+
+
+class TestRerank(unittest.TestCase):
+
+    def setUp(self):
+        # Первые кандидаты — сплошь "sports", как у пользователя, лайкнувшего спорт
+        self.tags = {i: ['sports'] for i in range(1, 9)}
+        self.tags.update({9: ['music'], 10: ['travel'], 11: ['sports', 'music']})
+        self.candidates = list(range(1, 12))
+
+    def test_zero_diversity_keeps_order(self):
+        """Тестируем, что без разнообразия сохраняется исходный порядок"""
+        result = rerank.mmr(self.candidates, self.tags.get, k=5, diversity=0.0)
+        self.assertEqual(result, [1, 2, 3, 4, 5])
+
+    def test_diversity_promotes_other_tags(self):
+        """Тестируем, что разнообразие поднимает позиции с другими тегами"""
+        result = rerank.mmr(self.candidates, self.tags.get, k=3, diversity=0.7)
+        self.assertEqual(result[0], 1)
+        self.assertEqual(set(result[1:]), {9, 10})
+
+    def test_pool_bounds_candidates(self):
+        """Тестируем, что рассматриваются только первые pool кандидатов"""
+        result = rerank.mmr(self.candidates, self.tags.get, k=10, diversity=1.0, pool=4)
+        self.assertEqual(sorted(result), [1, 2, 3, 4])
+
+    def test_works_with_positions(self):
+        """Тестируем переранжирование результата get_recommend_position"""
+        positions = [Position(1, "A", ["sports"]), Position(2, "B", ["sports"]), Position(3, "C", ["music"])]
+        result = rerank.mmr(positions, Position.get_tags, k=2, diversity=0.8)
+        self.assertEqual([p.get_id() for p in result], [1, 3])
+
+    def test_parse_options(self):
+        """Тестируем разбор и проверку параметров запроса"""
+        self.assertIsNone(rerank.parse_options({}))
+        self.assertEqual(rerank.parse_options({'diversity': ['0.3'], 'limit': ['5']}),
+                         {'diversity': 0.3, 'k': 5, 'pool': rerank.DEFAULT_POOL})
+        for query in ({'diversity': ['2']}, {'diversity': ['x']},
+                      {'diversity': ['0.5'], 'limit': ['10'], 'pool': ['5']}):
+            with self.assertRaises(ValueError):
+                rerank.parse_options(query)
+
+
+if __name__ == '__main__':
+    unittest.main()
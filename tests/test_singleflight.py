@@ -0,0 +1,71 @@
+import unittest
+import threading
+from storage.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def run_concurrently(self, flight, key, fn, count):
+        results, errors = [], []
+
+        def worker():
+            try:
+                results.append(flight.do(key, fn))
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_concurrent_calls_share_result(self):
+        """Тестируем, что одновременные вызовы с одним ключом выполняются один раз"""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return [1, 2, 3]
+
+        threads, results, _ = self.run_concurrently(flight, "key", compute, 8)
+        while flight.shared < 7:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[1, 2, 3]] * 8)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_error_is_shared(self):
+        """Тестируем, что исключение получают все ожидающие"""
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def compute():
+            release.wait(5)
+            raise ValueError("нет пользователя")
+
+        threads, results, errors = self.run_concurrently(flight, "key", compute, 4)
+        while flight.shared < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(results, [])
+
+    def test_no_caching_after_completion(self):
+        """Тестируем, что последовательные вызовы выполняются заново"""
+        flight = SingleFlight()
+        counter = iter(range(10))
+        self.assertEqual(flight.do("key", lambda: next(counter)), 0)
+        self.assertEqual(flight.do("key", lambda: next(counter)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджеты холодного старта, секунд: около 4x от измеренных 0.065 и 0.09 c
+IMPORT_BUDGET = 0.25
+STARTUP_BUDGET = 0.4
+
+
+def run_python(code):
+    """Выполняет код в чистом интерпретаторе из корня репозитория и возвращает его JSON-вывод"""
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise AssertionError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_import_is_fast_and_loads_nothing(self):
+        """Тестируем, что импорт сервера укладывается в бюджет и не читает данные"""
+        data = run_python(
+            "import json, sys, time\n"
+            "started = time.perf_counter()\n"
+            "import httpserver\n"
+            "print(json.dumps({'seconds': time.perf_counter() - started, 'loaded': httpserver.app.loaded(),\n"
+            "                  'optional': [m for m in ('tracemalloc', 'storage.replication') if m in sys.modules]}))\n"
+        )
+        self.assertEqual(data['loaded'], [])
+        self.assertEqual(data['optional'], [])
+        self.assertLess(data['seconds'], IMPORT_BUDGET)
+
+    def test_startup_within_budget(self):
+        """Тестируем, что загрузка данных при первом обращении укладывается в бюджет"""
+        data = run_python(
+            "import json, time\n"
+            "started = time.perf_counter()\n"
+            "import httpserver\n"
+            "httpserver.app.warm_up()\n"
+            "print(json.dumps({'seconds': time.perf_counter() - started, 'loaded': httpserver.app.loaded()}))\n"
+        )
+        self.assertEqual(data['loaded'], ['catalog_manager', 'popularity', 'user_store'])
+        self.assertLess(data['seconds'], STARTUP_BUDGET)
+
+    def test_position_module_does_not_import_users(self):
+        """Тестируем отсутствие цикла импорта: рекомендации items.position работают без user.user"""
+        data = run_python(
+            "import json, sys\n"
+            "from items.position import Position\n"
+            "recommended = Position.get_recommend_position(1)\n"
+            "print(json.dumps({'user_imported': 'user.user' in sys.modules, 'found': isinstance(recommended, list)}))\n"
+        )
+        self.assertFalse(data['user_imported'])
+        self.assertTrue(data['found'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -76,6 +76,12 @@ class TestUser(unittest.TestCase):
         self.assertEqual(last_user.get_dislikes(), ["spicy food"])
         self.assertEqual(last_user.get_viewed(), [43])
 
+    def test_add_user_existing_id(self):
+        """Тестируем, что add_user не перезаписывает существующего пользователя"""
+        with self.assertRaises(ValueError):
+            User.add_user(User(1, "Mallory", [], [], []))
+        self.assertEqual(User.get_user_by_id(1).get_name(), "Alice")
+
     def test_get_uniq_id(self):
         """Тестируем метод get_uniq_id."""
         uniq_id = User.get_uniq_id()
@@ -0,0 +1,154 @@
+import unittest
+import os
+import tempfile
+import threading
+from storage import codec, rebalance, user_store
+from storage.sharding import HashRing
+from storage.user_store import UserStore
+from tests.helpers import make_user
+from user.viewed import ViewedSet
+
+
+class TestHashRing(unittest.TestCase):
+
+    def test_stable_and_balanced(self):
+        """Тестируем стабильность и равномерность распределения ключей"""
+        ring = HashRing(["a", "b", "c"])
+        owners = [ring.node_for(key) for key in range(3000)]
+        self.assertEqual(owners, [ring.node_for(key) for key in range(3000)])
+        for node in ("a", "b", "c"):
+            self.assertGreater(owners.count(node), 600)
+
+    def test_add_node_moves_only_to_new_node(self):
+        """Тестируем, что при добавлении узла ключи уходят только на новый узел"""
+        ring = HashRing(["a", "b"])
+        before = {key: ring.node_for(key) for key in range(2000)}
+        ring.add_node("c")
+        for key, owner in before.items():
+            self.assertIn(ring.node_for(key), (owner, "c"))
+
+
+class TestUserStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.tmp.name, f"users-{i}.json") for i in range(3)]
+        self.store = UserStore(self.paths)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_routing(self):
+        """Тестируем, что каждый пользователь записывается только в свой шард"""
+        for user_id in range(1, 101):
+            self.store.add(make_user(user_id))
+        total = 0
+        for path in self.paths:
+            records = codec.read_file(path)
+            total += len(records)
+            for record in records:
+                self.assertEqual(self.store.shard_for(record["id"]).path, path)
+        self.assertEqual(total, 100)
+        self.assertEqual(self.store.get(42)["name"], "User 42")
+        self.assertEqual(set(self.store.get_many([1, 2, 999])), {1, 2})
+
+        with self.assertRaises(ValueError):
+            self.store.add(make_user(1))
+
+    def test_viewed_set_built_once(self):
+        """Тестируем, что ViewedSet хранится с записью, а не строится на каждое чтение"""
+        self.store.add({**make_user(1), "viewed": [3, 1, 2]})
+        viewed = self.store.get(1)["viewed"]
+        self.assertIsInstance(viewed, ViewedSet)
+        self.assertIs(self.store.get(1)["viewed"], viewed)
+        self.assertIsInstance(UserStore(self.paths).get(1)["viewed"], ViewedSet)
+        self.assertEqual(codec.read_file(self.store.shard_for(1).path)[0]["viewed"], [3, 1, 2])
+
+    def test_update(self):
+        """Тестируем атомарное обновление записи"""
+        self.store.add(make_user(1))
+        self.store.update(1, lambda record: {**record, "viewed": list(record["viewed"]) + [5]})
+        self.assertEqual(UserStore(self.paths).get(1)["viewed"], [5])
+        with self.assertRaises(ValueError):
+            self.store.update(99, lambda record: record)
+
+    def test_concurrent_updates(self):
+        """Тестируем, что параллельные записи не теряются"""
+        for user_id in range(1, 11):
+            self.store.add(make_user(user_id))
+
+        def worker(user_id):
+            for item in range(20):
+                self.store.update(user_id, lambda record: {**record, "viewed": list(record["viewed"]) + [item]})
+
+        threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in range(1, 11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        reloaded = UserStore(self.paths)
+        for user_id in range(1, 11):
+            self.assertEqual(reloaded.get(user_id)["viewed"], list(range(20)))
+
+    def test_add_shard(self):
+        """Тестируем ребалансировку при добавлении шарда"""
+        for user_id in range(1, 301):
+            self.store.add(make_user(user_id))
+        new_path = os.path.join(self.tmp.name, "users-3.json")
+        moved = self.store.add_shard(new_path)
+
+        self.assertGreater(moved, 0)
+        self.assertEqual(len(codec.read_file(new_path)), moved)
+        self.assertEqual(len(self.store.all()), 300)
+        for user_id in range(1, 301):
+            self.assertIsNotNone(self.store.get(user_id))
+        reloaded = UserStore(self.paths + [new_path])
+        self.assertEqual(len(reloaded.ids()), 300)
+
+    def test_add_shard_survives_restart(self):
+        """Тестируем, что добавленный шард подключается по манифесту при запуске с исходными файлами"""
+        for user_id in range(1, 101):
+            self.store.add(make_user(user_id))
+        new_path = os.path.join(self.tmp.name, "users-3.json")
+        self.store.add_shard(new_path)
+
+        reloaded = UserStore(self.paths)
+        self.assertEqual(reloaded.shards()[-1].path, new_path)
+        for user_id in range(1, 101):
+            self.assertIsNotNone(reloaded.get(user_id))
+        with self.assertRaises(ValueError):
+            UserStore(self.paths + [os.path.join(self.tmp.name, "users-5.json")])
+
+    def test_same_file_names_in_different_directories(self):
+        """Тестируем, что шарды с одинаковым именем файла в разных каталогах — разные узлы кольца"""
+        paths = [os.path.join(self.tmp.name, name, "users.json") for name in ("a", "b")]
+        for path in paths:
+            os.mkdir(os.path.dirname(path))
+        store = UserStore(paths)
+        for user_id in range(1, 101):
+            store.add(make_user(user_id))
+        self.assertEqual(len(store.shards()), 2)
+        self.assertTrue(all(codec.read_file(path) for path in paths))
+
+    @unittest.skipIf(user_store.fcntl is None, "захват файлов недоступен")
+    def test_claim(self):
+        """Тестируем, что файлы, захваченные хранилищем, не может изменить другой процесс"""
+        self.store.claim()
+        self.addCleanup(self.store.release)
+        with self.assertRaises(ValueError):
+            UserStore(self.paths).claim()
+        with self.assertRaises(SystemExit):
+            rebalance.main(["--shards", *self.paths, "--add", os.path.join(self.tmp.name, "users-4.json")])
+
+        new_path = os.path.join(self.tmp.name, "users-3.json")
+        self.store.add_shard(new_path)
+        with self.assertRaises(ValueError):
+            UserStore([new_path]).claim()
+        self.store.release()
+        other = UserStore(self.paths + [new_path])
+        other.claim()
+        other.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
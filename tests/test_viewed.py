@@ -0,0 +1,49 @@
+import unittest
+from user.viewed import ViewedSet
+
+
+class TestViewedSet(unittest.TestCase):
+
+    def test_add_and_contains(self):
+        """Тестируем добавление и проверку вхождения"""
+        viewed = ViewedSet([5, 3])
+        self.assertTrue(viewed.add(10))
+        self.assertFalse(viewed.add(3))
+        self.assertIn(10, viewed)
+        self.assertIn(5, viewed)
+        self.assertNotIn(4, viewed)
+        self.assertNotIn("str", viewed)
+        self.assertEqual(len(viewed), 3)
+
+    def test_rejects_non_integer_ids(self):
+        """Тестируем ValueError для id, которые нельзя хранить в массиве int64"""
+        for item in ("abc", 1.5, True, 2 ** 63):
+            with self.assertRaises(ValueError):
+                ViewedSet([item])
+
+    def test_order_preserved(self):
+        """Тестируем сохранение порядка добавления при сериализации"""
+        viewed = ViewedSet([122, 42, 7])
+        self.assertEqual(viewed.to_list(), [122, 42, 7])
+        self.assertEqual(viewed, [122, 42, 7])
+        self.assertEqual(str(viewed), "[122, 42, 7]")
+
+    def test_copy_is_independent(self):
+        """Тестируем, что изменение копии не меняет исходное множество"""
+        viewed = ViewedSet([9, 1, 4, 1])
+        copy = viewed.copy()
+        self.assertTrue(copy.add(2))
+        self.assertEqual(viewed, [9, 1, 4])
+        self.assertNotIn(2, viewed)
+        self.assertIn(2, copy)
+
+    def test_difference(self):
+        """Тестируем разность с отсортированными и неотсортированными кандидатами"""
+        viewed = ViewedSet([2, 8, 5])
+        self.assertEqual(viewed.difference([1, 2, 3, 5, 8, 9]), [1, 3, 9])
+        self.assertEqual(viewed.difference([9, 8, 1, 2]), [9, 1])
+        self.assertEqual(viewed.difference(range(1, 4)), [1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,18 @@
-import json
+from items.position import Position
+from storage.user_store import get_store
+from user.viewed import as_viewed_set
 
 
 class User:
     FILE_PATH = "./users.json"  # Приватный атрибут для хранения пути к файлу
+    SHARD_PATHS = None  # Файлы-шарды пользователей; None — все пользователи в FILE_PATH
 
     def __init__(self, id, name, likes, dislikes, viewed):
         self.__id = id  # Приватные атрибуты экземпляра
         self.__name = name
         self.__likes = likes
         self.__dislikes = dislikes
-        self.__viewed = viewed
+        self.__viewed = as_viewed_set(viewed)
 
     def get_id(self):
         return self.__id
@@ -33,38 +36,34 @@ class User:
             "name": self.__name,
             "like_categories": self.__likes,
             "dislike_categories": self.__dislikes,
-            "viewed": self.__viewed
+            "viewed": self.__viewed  # Хранилище держит запись вместе с ViewedSet
         }
 
+    @staticmethod
+    def __from_dict(record):
+        """Создаёт объект User из записи хранилища (списки копируются)"""
+        return User(record["id"], record["name"], list(record["like_categories"]),
+                    list(record["dislike_categories"]), as_viewed_set(record["viewed"]).copy())
+
+    @staticmethod
+    def get_store():
+        """Возвращает хранилище пользователей: шарды SHARD_PATHS или единственный FILE_PATH"""
+        return get_store(User.SHARD_PATHS or [User.FILE_PATH])
+
     @staticmethod
     def __read_file():
-        """Считывает пользователей из файла и возвращает список объектов User"""
-        users = []
-        try:
-            with open(User.FILE_PATH, "r", encoding="utf-8") as f:
-                content = f.read()
-                temp = json.loads(content) if content else []
-            for item in temp:
-                user = User(item["id"], item["name"], item["like_categories"], item["dislike_categories"],
-                            item["viewed"])
-                users.append(user)
-        except FileNotFoundError:
-            return []
-        return users
+        """Считывает пользователей из всех шардов и возвращает список объектов User"""
+        return [User.__from_dict(record) for record in User.get_store().all()]
 
     @staticmethod
     def add_user(user):
-        """Добавляет нового пользователя в файл users.json"""
-        users = User.__read_file()
-        users.append(user)
-        with open(User.FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump([u.__to_dict() for u in users], f, indent=4, ensure_ascii=False)
+        """Добавляет нового пользователя в шард, которому принадлежит его id; ValueError, если id занят"""
+        User.get_store().add(user.__to_dict())
 
     @staticmethod
     def get_uniq_id():
         """Ищет уникальный id"""
-        users = User.__read_file()
-        existing_ids = {user.__id for user in users}
+        existing_ids = User.get_store().ids()
         new_id = 1
         while new_id in existing_ids:
             new_id += 1
@@ -73,78 +72,61 @@ class User:
     @staticmethod
     def add_like_to_user(user_id, position_id):
         """Добавляет категорию в список лайков конкретного пользователя"""
-        from items.position import Position
-        users = User.__read_file()
-
-        if Position.get_position_by_id(position_id) == "Позиция не найдена":
+        position = Position.get_position_by_id(position_id)
+        if position == "Позиция не найдена":
             raise ValueError("Позиция не найдена")
 
-        categories = Position.get_category_by_position_id(position_id)
-        for user in users:
-            if user.__id == user_id:
-                for category in categories:
-                    if category not in user.__likes and category not in user.__dislikes:
-                        user.__likes.append(category)
-                break
+        categories = position.get_tags()
 
-        else:
-            raise ValueError(f"Пользователь с id {user_id} не найден")
+        def change(record):
+            user = User.__from_dict(record)
+            for category in categories:
+                if category not in user.__likes and category not in user.__dislikes:
+                    user.__likes.append(category)
+            return user.__to_dict()
 
-        with open(User.FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump([u.__to_dict() for u in users], f, indent=4, ensure_ascii=False)
+        User.get_store().update(user_id, change, interaction=('like', position_id))
 
     @staticmethod
     def add_dislike_to_user(user_id, position_id):
         """Добавляет категорию в список дизлайков конкретного пользователя"""
-        from items.position import Position
-        users = User.__read_file()
-
-        if Position.get_position_by_id(position_id) == "Позиция не найдена":
+        position = Position.get_position_by_id(position_id)
+        if position == "Позиция не найдена":
             raise ValueError("Позиция не найдена")
 
-        categories = Position.get_category_by_position_id(position_id)
-        for user in users:
-            if user.__id == user_id:
-                for category in categories:
-                    if category not in user.__likes and category not in user.__dislikes:
-                        user.__dislikes.append(category)
-                break
-        else:
-            raise ValueError(f"Пользователь с id {user_id} не найден")
+        categories = position.get_tags()
+
+        def change(record):
+            user = User.__from_dict(record)
+            for category in categories:
+                if category not in user.__likes and category not in user.__dislikes:
+                    user.__dislikes.append(category)
+            return user.__to_dict()
 
-        with open(User.FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump([u.__to_dict() for u in users], f, indent=4, ensure_ascii=False)
+        User.get_store().update(user_id, change)
 
     @staticmethod
     def add_viewed_item(user_id, item):
         """Добавляет элемент в список viewed пользователя с заданным id"""
-        from items.position import Position
         if Position.get_position_by_id(item) == "Позиция не найдена":
             raise ValueError("Позиция не найдена")
-        users = User.__read_file()
-        found = False
-        for user in users:
-            if user.__id == user_id:
-                if item in user.__viewed:
-                    raise ValueError(f"Позиция {item} уже была добавлена")
-                else:
-                    user.__viewed.append(item)
-                    found = True
-                    break
-        if not found:
-            raise ValueError(f"Пользователь с id {user_id} не найден")
-
-        with open(User.FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump([u.__to_dict() for u in users], f, indent=4, ensure_ascii=False)
+
+        def change(record):
+            user = User.__from_dict(record)
+            if not user.__viewed.add(item):
+                raise ValueError(f"Позиция {item} уже была добавлена")
+            return user.__to_dict()
+
+        User.get_store().update(user_id, change)
 
     @staticmethod
     def get_user_by_id(id):
         """Возвращает пользователя по id"""
-        users = User.__read_file()
-        for user in users:
-            if user.__id == id:
-                return user
-        raise ValueError(f"Пользователь с id {id} не найден")
+        record = User.get_store().get(id)
+        if record is None:
+            raise ValueError(f"Пользователь с id {id} не найден")
+        return User.__from_dict(record)
 
     def __str__(self):
         return f"{self.__id}  {self.__name} {self.__likes} {self.__dislikes} {self.__viewed}"
+
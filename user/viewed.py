@@ -0,0 +1,108 @@
+from array import array
+from bisect import bisect_left, insort
+
+
+class ViewedSet:
+    """Компактное множество просмотренных позиций.
+
+    Хранит id в двух массивах array('q'): в порядке добавления (для сериализации)
+    и отсортированном (для проверки вхождения через bisect за O(log n)).
+    """
+
+    TYPECODE = 'q'
+
+    def __init__(self, items=()):
+        """Строит множество за один проход: O(n log n) вместо вставки каждого id в отсортированный массив"""
+        order = list(dict.fromkeys(items))
+        if set(map(type, order)) - {int}:
+            for item in order:
+                _check_id(item)
+        try:
+            self.__order = array(self.TYPECODE, order)
+        except OverflowError:
+            raise ValueError("Id позиции вне допустимого диапазона")
+        self.__sorted = array(self.TYPECODE, sorted(order))
+
+    def copy(self):
+        """Независимая копия: массивы копируются целиком, без пересортировки"""
+        viewed = ViewedSet()
+        viewed.__order = array(self.TYPECODE, self.__order)
+        viewed.__sorted = array(self.TYPECODE, self.__sorted)
+        return viewed
+
+    def add(self, item):
+        """Добавляет id, возвращает False, если он уже был в множестве.
+
+        ValueError, если item не целое число, помещающееся в int64.
+        """
+        _check_id(item)
+        if item in self:
+            return False
+        try:
+            self.__order.append(item)
+        except OverflowError:
+            raise ValueError(f"Id позиции {item} вне допустимого диапазона")
+        insort(self.__sorted, item)
+        return True
+
+    def __contains__(self, item):
+        if not isinstance(item, int):
+            return False
+        index = bisect_left(self.__sorted, item)
+        return index < len(self.__sorted) and self.__sorted[index] == item
+
+    def __iter__(self):
+        return iter(self.__order)
+
+    def __len__(self):
+        return len(self.__order)
+
+    def __eq__(self, other):
+        if isinstance(other, ViewedSet):
+            return self.__order == other.__order
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+    def to_list(self):
+        """Список id в порядке добавления — формат хранения в JSON"""
+        return self.__order.tolist()
+
+    def difference(self, candidate_ids):
+        """Возвращает id из candidate_ids, которых нет в множестве.
+
+        Для отсортированных кандидатов используется слияние за O(n + m),
+        иначе — бинарный поиск для каждого кандидата.
+        """
+        if isinstance(candidate_ids, (list, tuple, array)) and _is_sorted(candidate_ids):
+            return self.__merge_difference(candidate_ids)
+        return [item for item in candidate_ids if item not in self]
+
+    def __merge_difference(self, candidate_ids):
+        result = []
+        viewed = self.__sorted
+        i, n = 0, len(viewed)
+        for item in candidate_ids:
+            while i < n and viewed[i] < item:
+                i += 1
+            if i < n and viewed[i] == item:
+                continue
+            result.append(item)
+        return result
+
+
+def as_viewed_set(viewed):
+    """ViewedSet из поля viewed записи; уже построенное множество возвращается как есть"""
+    return viewed if isinstance(viewed, ViewedSet) else ViewedSet(viewed)
+
+
+def _check_id(item):
+    if isinstance(item, bool) or not isinstance(item, int):
+        raise ValueError(f"Id позиции должен быть целым числом, получено {item!r}")
+
+
+def _is_sorted(ids):
+    return all(ids[i] <= ids[i + 1] for i in range(len(ids) - 1))